@@ -145,6 +145,11 @@ def main(argv=None):
         app.run(argv or sys.argv[1:])
     except KeyboardInterrupt:
         pass
+    finally:
+        # Write deferred console output before any exit message or traceback
+        from infuse_iot.util.console import Console
+
+        Console.flush()
 
 
 if __name__ == "__main__":
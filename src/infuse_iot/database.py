@@ -106,6 +106,8 @@ class DeviceDatabase:
         self.gateway: int | None = None
         self.devices: dict[int, DeviceDatabase.DeviceState] = {}
         self.bt_addr: dict[InterfaceAddress.BluetoothLeAddr, int] = {}
+        # Devices with a known shared key, checked on every transmitted packet
+        self._shared_key_ids: set[int] = set()
         self._local_root: x25519.X25519PrivateKey | None = None
         self._local_root_public: bytes | None = None
         self._cache_path = cache_path
@@ -207,6 +209,7 @@ class DeviceDatabase:
         cache_key = self._from_cache(infuse_id, device_pub_key)
         if cache_key is not None:
             self.devices[infuse_id].shared_key = cache_key
+            self._shared_key_ids.add(infuse_id)
             return
 
         client = Client(base_url="https://api.infuse-iot.com").with_headers({"x-api-key": f"Bearer {get_api_key()}"})
@@ -226,6 +229,7 @@ class DeviceDatabase:
             else:
                 key = base64.b64decode(response.parsed.key)
                 self.devices[infuse_id].shared_key = key
+                self._shared_key_ids.add(infuse_id)
                 self._update_cache(infuse_id, device_pub_key, key)
 
     @staticmethod
@@ -257,9 +261,7 @@ class DeviceDatabase:
 
     def has_shared_key(self, infuse_id: int) -> bool:
         """Does the database have the shared key for this device?"""
-        if infuse_id not in self.devices:
-            return False
-        return self.devices[infuse_id].shared_key is not None
+        return infuse_id in self._shared_key_ids
 
     def has_network_id(self, infuse_id: int) -> bool:
         """Does the database know the network ID for this device?"""
@@ -56,7 +56,7 @@ class Address(Serializable):
 
         def __str__(self) -> str:
             t = "random" if self.addr_type == 1 else "public"
-            v = ":".join([f"{x:02x}" for x in self.addr_val.to_bytes(6, "big")])
+            v = self.addr_val.to_bytes(6, "big").hex(":")
             return f"{v} ({t})"
 
         def len(self):
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import ctypes
+import functools
 from collections.abc import Generator
 from typing import Any, cast
 
@@ -27,6 +28,10 @@ class TdfField:
             return f"{self.field}.{self.subfield}"
         return self.field
 
+    @property
+    def display_fmt(self) -> str:
+        return self._display_fmt
+
     def val_fmt(self) -> str:
         if isinstance(self.val, list) and self._display_fmt != "{}":
             return ",".join([self._display_fmt.format(v) for v in self.val])
@@ -91,7 +96,7 @@ class TdfReadingBase(ctypes.LittleEndianStructure):
         return info
 
     @classmethod
-    def from_buffer_consume(cls, source: bytes, offset: int = 0) -> Self:
+    def from_buffer_consume(cls, source: bytes | memoryview, offset: int = 0) -> Self:
         last_field = cls._fields_[-1]
 
         # Last value not a VLA
@@ -102,7 +107,6 @@ class TdfReadingBase(ctypes.LittleEndianStructure):
             return cls.from_buffer_copy(source, offset)
 
         base_size = ctypes.sizeof(cls)
-        var_name = last_field[0]
         var_type = last_field_type._type_
         var_type_size = ctypes.sizeof(var_type)
 
@@ -115,23 +119,31 @@ class TdfReadingBase(ctypes.LittleEndianStructure):
         if source_var_num == 0:
             return cls.from_buffer_copy(source, offset)
 
-        # Dynamically create subclass with correct length
-        class TdfVLA(ctypes.LittleEndianStructure):
-            NAME = cls.NAME
-            ID = cls.ID
-            _fields_ = cls._fields_[:-1] + [(var_name, source_var_num * var_type)]  # type: ignore
-            _pack_ = 1
-            _postfix_ = cls._postfix_
-            _display_fmt_ = cls._display_fmt_
-            _vla_field_ = var_name
-            iter_fields = cls.iter_fields
-            field_information = cls.field_information
-
-        # Copy convertor functions for fields
-        for f in cls._fields_:
-            if f[0][0] == "_":
-                f_name = f[0][1:]
-                setattr(TdfVLA, f_name, getattr(cls, f_name))
-
         # Create the object instance
-        return cast(Self, TdfVLA.from_buffer_copy(source, offset))
+        return cast(Self, _tdf_vla_subclass(cls, source_var_num).from_buffer_copy(source, offset))
+
+
+@functools.lru_cache(maxsize=128)
+def _tdf_vla_subclass(cls: type[TdfReadingBase], var_num: int) -> type[ctypes.LittleEndianStructure]:
+    """Dynamically create (and cache) a subclass of `cls` with a trailing VLA of `var_num` elements"""
+    var_name = cls._fields_[-1][0]
+    var_type = cls._fields_[-1][1]._type_  # type: ignore
+
+    class TdfVLA(ctypes.LittleEndianStructure):
+        NAME = cls.NAME
+        ID = cls.ID
+        _fields_ = cls._fields_[:-1] + [(var_name, var_num * var_type)]  # type: ignore
+        _pack_ = 1
+        _postfix_ = cls._postfix_
+        _display_fmt_ = cls._display_fmt_
+        _vla_field_ = var_name
+        iter_fields = cls.iter_fields
+        field_information = cls.field_information
+
+    # Copy convertor functions for fields
+    for f in cls._fields_:
+        if f[0][0] == "_":
+            f_name = f[0][1:]
+            setattr(TdfVLA, f_name, getattr(cls, f_name))
+
+    return TdfVLA
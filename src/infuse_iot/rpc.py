@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
 import ctypes
+import struct
+
+# security_state response: cloud public key, device public key, network ID, challenge response type.
+# Fixed portion of `definitions.rpc.security_state.response`, followed by the challenge response bytes.
+SECURITY_STATE_RSP = struct.Struct("<32s32sIB")
 
 
 class RequestHeader(ctypes.LittleEndianStructure):
@@ -2,6 +2,7 @@
 
 import ctypes
 import random
+import struct
 import time
 from collections.abc import Callable
 
@@ -16,6 +17,16 @@ from infuse_iot.socket_comms import (
     LocalClient,
 )
 
+_RSP_HDR_SZ = ctypes.sizeof(rpc.ResponseHeader)
+# rpc.RequestHeader: request ID, command ID
+_REQ_HDR = struct.Struct("<IH")
+# rpc.RequestDataHeader: total size, ACK period
+_REQ_DATA_HDR = struct.Struct("<IB")
+# rpc.DataHeader: request ID, offset
+_DATA_HDR = struct.Struct("<II")
+# Leading request ID common to RPC_RSP, RPC_DATA and RPC_DATA_ACK payloads
+_REQUEST_ID = struct.Struct("<I")
+
 
 class RpcClient:
     def __init__(
@@ -24,6 +35,7 @@ class RpcClient:
         max_payload: int,
         infuse_id: int,
         rx_cb: Callable[[ClientNotification], None] | None = None,
+        ack_window: int = 1,
     ):
         self._request_id = random.randint(0, 2**31 - 1)
         self._timeout = 10.0
@@ -32,6 +44,8 @@ class RpcClient:
         self._max_payload = max_payload
         self._rx_cb = rx_cb
         self.ack_period = 2
+        # Number of ACK periods that can be in flight before waiting on an ACK
+        self.ack_window = ack_window
         self.no_ack_sleep = 0.01
 
     def set_timeout(self, timeout: float):
@@ -42,7 +56,7 @@ class RpcClient:
     ) -> tuple[rpc.ResponseHeader, ctypes.LittleEndianStructure | None]:
         # Convert response bytes back to struct form
         rsp_header = rpc.ResponseHeader.from_buffer_copy(rpc_rsp.payload)
-        rsp_payload = rpc_rsp.payload[ctypes.sizeof(rpc.ResponseHeader) :]
+        rsp_payload = rpc_rsp.payload[_RSP_HDR_SZ:]
         try:
             rsp_data = rsp_decoder(rsp_payload)
         except ValueError:
@@ -64,14 +78,12 @@ class RpcClient:
             if not isinstance(rsp, ClientNotificationEpacketReceived):
                 continue
             if rsp.epacket.ptype == InfuseType.RPC_RSP:
-                rsp_header = rpc.ResponseHeader.from_buffer_copy(rsp.epacket.payload)
-                if rsp_header.request_id == self._request_id:
+                if _REQUEST_ID.unpack_from(rsp.epacket.payload)[0] == self._request_id:
                     return rsp.epacket
             elif rsp.epacket.ptype != InfuseType.RPC_DATA_ACK:
                 continue
-            data_ack = rpc.DataAck.from_buffer_copy(rsp.epacket.payload)
             # Response to the request we sent
-            if data_ack.request_id != self._request_id:
+            if _REQUEST_ID.unpack_from(rsp.epacket.payload)[0] != self._request_id:
                 continue
             return rsp.epacket
         return None
@@ -88,9 +100,8 @@ class RpcClient:
             # RPC response packet
             if rsp.epacket.ptype != InfuseType.RPC_RSP:
                 continue
-            rsp_header = rpc.ResponseHeader.from_buffer_copy(rsp.epacket.payload)
             # Response to the request we sent
-            if rsp_header.request_id != self._request_id:
+            if _REQUEST_ID.unpack_from(rsp.epacket.payload)[0] != self._request_id:
                 continue
             return rsp.epacket
         return None
@@ -107,10 +118,9 @@ class RpcClient:
         rsp_decoder: Callable[[bytes], ctypes.LittleEndianStructure],
     ) -> tuple[rpc.ResponseHeader | None, ctypes.LittleEndianStructure | None]:
         self._request_id += 1
-        header = rpc.RequestHeader(self._request_id, cmd_id)  # type: ignore
-        data_hdr = rpc.RequestDataHeader(total_size, self.ack_period)
-
-        request_packet = bytes(header) + bytes(data_hdr) + params
+        request_packet = (
+            _REQ_HDR.pack(self._request_id, cmd_id) + _REQ_DATA_HDR.pack(total_size, self.ack_period) + params
+        )
         pkt = PacketOutput(
             self._id,
             auth,
@@ -129,10 +139,10 @@ class RpcClient:
 
         # Send data payloads chunked as requested
         ack_cnt = 0
+        acks_pending = 0
         offset = 0
         for chunk_id, chunk in enumerate(data):
-            hdr = rpc.DataHeader(self._request_id, chunk_id if packet_idx else offset)
-            pkt_bytes = bytes(hdr) + chunk
+            pkt_bytes = _DATA_HDR.pack(self._request_id, chunk_id if packet_idx else offset) + chunk
             pkt = PacketOutput(
                 self._id,
                 auth,
@@ -143,14 +153,17 @@ class RpcClient:
 
             if self.ack_period:
                 ack_cnt += 1
-                # Wait for ACKs at the period
+                # Wait for ACKs at the period, once the window of unacknowledged periods is full
                 if ack_cnt == self.ack_period:
-                    recv = self._wait_data_ack()
-                    if recv is None:
-                        return None, None
-                    if recv.ptype == InfuseType.RPC_RSP:
-                        return self._finalise_command(recv, rsp_decoder)
                     ack_cnt = 0
+                    acks_pending += 1
+                    if acks_pending >= self.ack_window:
+                        recv = self._wait_data_ack()
+                        if recv is None:
+                            return None, None
+                        if recv.ptype == InfuseType.RPC_RSP:
+                            return self._finalise_command(recv, rsp_decoder)
+                        acks_pending -= 1
             else:
                 # Limit throughput to avoid blasting the entire file
                 time.sleep(self.no_ack_sleep)
@@ -175,7 +188,7 @@ class RpcClient:
         rsp_decoder: Callable[[bytes], ctypes.LittleEndianStructure],
     ) -> tuple[rpc.ResponseHeader | None, ctypes.LittleEndianStructure | None]:
         # Maxmimum payload size of interface
-        size = self._max_payload - ctypes.sizeof(rpc.DataHeader)
+        size = self._max_payload - _DATA_HDR.size
         # Round payload down to multiple of 4 bytes
         size -= size % 4
         # itertools.batched once Python 3.12 is the minimum version
@@ -204,10 +217,7 @@ class RpcClient:
         rsp_decoder: Callable[[bytes], ctypes.LittleEndianStructure],
     ) -> tuple[rpc.ResponseHeader, ctypes.LittleEndianStructure | None]:
         self._request_id += 1
-        header = rpc.RequestHeader(self._request_id, cmd_id)
-        data_hdr = rpc.RequestDataHeader(size, 0)
-
-        request_packet = bytes(header) + bytes(data_hdr) + params
+        request_packet = _REQ_HDR.pack(self._request_id, cmd_id) + _REQ_DATA_HDR.pack(size, 0) + params
         pkt = PacketOutput(
             self._id,
             auth,
@@ -226,31 +236,29 @@ class RpcClient:
             if not isinstance(rsp, ClientNotificationEpacketReceived):
                 continue
             if rsp.epacket.ptype == InfuseType.RPC_RSP:
-                rsp_header = rpc.ResponseHeader.from_buffer_copy(rsp.epacket.payload)
                 # Response to the request we sent
-                if rsp_header.request_id != self._request_id:
+                if _REQUEST_ID.unpack_from(rsp.epacket.payload)[0] != self._request_id:
                     continue
+                rsp_header = rpc.ResponseHeader.from_buffer_copy(rsp.epacket.payload)
                 # Convert response bytes back to struct form
-                rsp_payload = rsp.epacket.payload[ctypes.sizeof(rpc.ResponseHeader) :]
+                rsp_payload = rsp.epacket.payload[_RSP_HDR_SZ:]
                 rsp_data = rsp_decoder(rsp_payload)
                 return (rsp_header, rsp_data)
 
             if rsp.epacket.ptype != InfuseType.RPC_DATA:
                 continue
-            data = rpc.DataHeader.from_buffer_copy(rsp.epacket.payload)
+            request_id, offset = _DATA_HDR.unpack_from(rsp.epacket.payload)
             # Response to the request we sent
-            if data.request_id != self._request_id:
+            if request_id != self._request_id:
                 continue
 
-            recv_cb(data.offset, rsp.epacket.payload[ctypes.sizeof(rpc.DataHeader) :])
+            recv_cb(offset, rsp.epacket.payload[_DATA_HDR.size :])
 
     def run_standard_cmd(
         self, cmd_id: int, auth: Auth, params: bytes, rsp_decoder: Callable[[bytes], ctypes.LittleEndianStructure]
     ) -> tuple[rpc.ResponseHeader | None, ctypes.LittleEndianStructure | None]:
         self._request_id += 1
-        header = rpc.RequestHeader(self._request_id, cmd_id)  # type: ignore
-
-        request_packet = bytes(header) + params
+        request_packet = _REQ_HDR.pack(self._request_id, cmd_id) + params
         pkt = PacketOutput(
             self._id,
             auth,
@@ -3,6 +3,7 @@
 
 import infuse_iot.definitions.rpc as defs
 from infuse_iot.commands import InfuseRpcCommand
+from infuse_iot.time import InfuseTime, InfuseTimeSource
 from infuse_iot.zephyr.errno import errno
 
 
@@ -25,8 +26,6 @@ class last_reboot(InfuseRpcCommand, defs.last_reboot):
             print(f"Failed to query reboot info ({errno.strerror(-return_code)})")
             return
 
-        from infuse_iot.time import InfuseTime, InfuseTimeSource
-
         t_remote = InfuseTime.unix_time_from_epoch(response.epoch_time)
 
         print(f"\t     Reason: {response.reason}")
@@ -2,7 +2,7 @@
 
 import base64
 import ctypes
-import random
+import os
 
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import x25519
@@ -54,7 +54,7 @@ class security_state(InfuseRpcCommand, defs.security_state):
         parser.add_argument("--base64", action="store_true", help="Print results as base64")
 
     def __init__(self, args):
-        self.challenge = random.randbytes(16)
+        self.challenge = os.urandom(16)
         self.pem = args.pem
         self.base64 = args.base64
 
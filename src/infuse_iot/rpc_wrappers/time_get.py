@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
+import time
 
 import infuse_iot.definitions.rpc as defs
 from infuse_iot.commands import InfuseRpcCommand
+from infuse_iot.time import InfuseTime, InfuseTimeSource
 from infuse_iot.zephyr.errno import errno
 
 
@@ -25,10 +27,6 @@ class time_get(InfuseRpcCommand, defs.time_get):
             print(f"Failed to query current time ({errno.strerror(-return_code)})")
             return
 
-        import time
-
-        from infuse_iot.time import InfuseTime, InfuseTimeSource
-
         t_remote = InfuseTime.unix_time_from_epoch(response.epoch_time)
         t_local = time.time()
         sync_age = f"{response.sync_age} seconds ago" if response.sync_age != 2**32 - 1 else "Never"
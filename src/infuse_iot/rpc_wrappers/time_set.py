@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
+import time
 
 import infuse_iot.definitions.rpc as defs
 from infuse_iot.commands import InfuseRpcCommand
+from infuse_iot.time import InfuseTime
 from infuse_iot.zephyr.errno import errno
 
 
@@ -15,10 +17,6 @@ class time_set(InfuseRpcCommand, defs.time_set):
         pass
 
     def request_struct(self):
-        import time
-
-        from infuse_iot.time import InfuseTime
-
         return self.request(InfuseTime.epoch_time_from_unix(time.time()))
 
     def handle_response(self, return_code, response):
@@ -2,41 +2,47 @@
 
 import ctypes
 
-import tabulate
-
 from infuse_iot.commands import InfuseRpcCommand
 from infuse_iot.definitions import rpc as rpc_defs
 from infuse_iot.definitions import tdf as tdf_defs
+from infuse_iot.time import InfuseTime
 from infuse_iot.zephyr.errno import errno
 
 
 class zbus_channel_state(InfuseRpcCommand, rpc_defs.zbus_channel_state):
     class BatteryChannel:
         id = 0x43210000
+        id_str = str(id)
         data = tdf_defs.readings.battery_state
 
     class AmbeintEnvChannel(ctypes.LittleEndianStructure):
         id = 0x43210001
+        id_str = str(id)
         data = tdf_defs.readings.ambient_temp_pres_hum
 
     class ImuChannel(ctypes.LittleEndianStructure):
         id = 0x43210002
+        id_str = str(id)
         data = None
 
     class AccMagChannel(ctypes.LittleEndianStructure):
         id = 0x43210003
+        id_str = str(id)
         data = None
 
     class LocationChannel(ctypes.LittleEndianStructure):
         id = 0x43210004
+        id_str = str(id)
         data = tdf_defs.readings.gcs_wgs84_llha
 
     class NavPvtUbxChannel(ctypes.LittleEndianStructure):
         id = 0x43210007
+        id_str = str(id)
         data = tdf_defs.readings.ubx_nav_pvt
 
     class NavPvtNRFChannel(ctypes.LittleEndianStructure):
         id = 0x43210008
+        id_str = str(id)
         data = tdf_defs.readings.nrf9x_gnss_pvt
 
     @classmethod
@@ -99,29 +105,32 @@ class zbus_channel_state(InfuseRpcCommand, rpc_defs.zbus_channel_state):
         return self.request(self._channel.id)
 
     def request_json(self):
-        return {"channel_id": str(self._channel.id)}
+        return {"channel_id": self._channel.id_str}
 
     def handle_response(self, return_code, response):
         if return_code != 0:
             print(f"Failed to query channel ({errno.strerror(-return_code)})")
             return
 
-        from infuse_iot.time import InfuseTime
-
         pub_time = InfuseTime.unix_time_from_epoch(response.publish_timestamp)
-        data_bytes = bytes(response.data)
+        data_mv = memoryview(response.data).cast("B")
 
         print(f"\t  Publish time: {InfuseTime.utc_time_string(pub_time)}")
         print(f"\t Publish count: {response.publish_count}")
         print(f"\tPublish period: {response.publish_period_avg_ms} ms")
         try:
             if self._channel.data is None:
-                print(f"\t          Data: {data_bytes.hex()}")
+                print(f"\t          Data: {data_mv.hex()}")
             else:
-                data = self._channel.data.from_buffer_copy(data_bytes)
-                table = []
-                for field in data.iter_fields():
-                    table.append([field.name, field.val_fmt(), field.postfix])
-                print(tabulate.tabulate(table, tablefmt="simple"))
+                # Alias the response storage rather than copying it again
+                if data_mv.readonly:
+                    data = self._channel.data.from_buffer_copy(data_mv)
+                else:
+                    data = self._channel.data.from_buffer(data_mv)
+                rows = [(f.name, f.val_fmt(), f.postfix) for f in data.iter_fields()]
+                w0 = max((len(r[0]) for r in rows), default=0)
+                w1 = max((len(r[1]) for r in rows), default=0)
+                for name, val, post in rows:
+                    print(f"\t{name:>{w0}} {val:>{w1}} {post}")
         except Exception as _:
-            print(f"\t          Data: {data_bytes.hex()}")
+            print(f"\t          Data: {bytes(data_mv).hex()}")
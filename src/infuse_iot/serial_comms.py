@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
 
+import io
+import os
+import select
+import struct
 import time
 from abc import ABCMeta, abstractmethod
 from io import BufferedWriter
@@ -9,6 +13,9 @@ import serial
 from pyocd.core.helpers import ConnectHelper
 from pyocd.debug.rtt import GenericRTTControlBlock
 
+# Delay before polling an idle RTT channel again
+RTT_IDLE_POLL = 0.005
+
 
 class SerialBadNameException(Exception):
     def __init__(self, requested: str, options: list[str]):
@@ -20,32 +27,61 @@ class SerialFrame:
     """Serial frame reconstructor"""
 
     SYNC = b"\xd5\xca"
-
-    @classmethod
-    def reconstructor(cls):
-        length = 0
-        buffered = bytearray()
-        packet = None
-        while True:
-            # Is the current byte part of a packet?
-            consumed = len(buffered) > 0 or packet is not None
-            # Get next byte from port, yield current state
-            val = yield consumed, packet
-            packet = None
-            # Append value to buffer
-            buffered.append(val)
-            # Wait for packet sync bytes
-            if len(buffered) <= 2:
-                if val != cls.SYNC[len(buffered) - 1]:
-                    buffered = bytearray()
-                    continue
-            # Store length
-            elif len(buffered) == 4:
-                length = int.from_bytes(buffered[2:], "little")
-            # Complete packet received
-            elif len(buffered) == 4 + length:
-                packet = buffered[4:]
-                buffered = bytearray()
+    _LEN = struct.Struct("<H")
+
+    class Reconstructor:
+        """Reconstruct serial frames from arbitrarily sized chunks of received bytes"""
+
+        def __init__(self):
+            self._buffer = bytearray()
+            # Payload length of the partially received frame at the start of the buffer
+            self._length: int | None = None
+
+        def feed(self, data: bytes) -> tuple[list[bytearray], bytearray]:
+            """
+            Consume a chunk of received bytes.
+
+            Returns the list of completed frame payloads, and the bytes that were not
+            part of any frame. Bytes belonging to an incomplete frame are retained
+            until the remainder of the frame is received.
+            """
+            sync = SerialFrame.SYNC
+            buf = self._buffer
+            if not buf and sync[0] not in data:
+                # Fast path for plain console output, nothing can be part of a frame
+                return [], bytearray(data)
+            buf.extend(data)
+            # Scan with an offset and compact the buffer once at the end, rather than
+            # shifting the remaining bytes down after every frame.
+            end = len(buf)
+            off = 0
+            frames: list[bytearray] = []
+            text = bytearray()
+            while off < end:
+                length = self._length
+                if length is None:
+                    idx = buf.find(sync, off)
+                    if idx == -1:
+                        # No frame in the buffer, retain a trailing byte that could be the start of a sync
+                        keep = 1 if buf[-1] == sync[0] else 0
+                        text += buf[off : end - keep]
+                        off = end - keep
+                        break
+                    text += buf[off:idx]
+                    off = idx
+                    # Wait for the length field
+                    if end - off < 4:
+                        break
+                    length = SerialFrame._LEN.unpack_from(buf, off + 2)[0]
+                # Wait for the complete frame, remembering the length so the header isn't parsed again
+                if end - off < 4 + length:
+                    self._length = length
+                    break
+                self._length = None
+                frames.append(buf[off + 4 : off + 4 + length])
+                off += 4 + length
+            del buf[:off]
+            return frames, text
 
 
 class SerialLike(metaclass=ABCMeta):
@@ -59,12 +95,16 @@ class SerialLike(metaclass=ABCMeta):
 
     @abstractmethod
     def ping(self):
-        """Magic 1 byte frame to request a response"""
+        """Magic 1 byte frame to request a response, call `drain` to ensure it has been sent"""
 
     @abstractmethod
     def write(self, packet: bytes):
         """Write a serial frame to the port"""
 
+    @abstractmethod
+    def drain(self) -> None:
+        """Block until all written data has been transmitted"""
+
     @abstractmethod
     def close(self):
         """Close the serial port"""
@@ -82,28 +122,55 @@ class SerialPort(SerialLike):
         self._ser.port = str(serial_port)
         self._ser.baudrate = baudrate
         self._ser.timeout = 0.05
+        # Writes are not flushed individually, ensure a stuck UART still raises
+        self._ser.write_timeout = 1.0
         # Prepend leading 0's for high baudrates to give sleepy
         # receivers (STM32) time to wake up on RX before real data arrives.
         self._prefix = b"\x00\x00" if baudrate > 115200 else b""
+        self._fd: int | None = None
 
     def open(self, timeout: float | None = None):
         self._ser.open()
+        try:
+            # POSIX ports expose the underlying file descriptor, Windows and URL handler ports do not
+            self._fd = self._ser.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            self._fd = None
 
     def read_bytes(self, num) -> bytes:
-        return self._ser.read(num)
+        if self._fd is not None:
+            # Single select and read of everything available, bypassing the pyserial read loop
+            ready, _, _ = select.select([self._fd], [], [], self._ser.timeout)
+            if not ready:
+                return b""
+            try:
+                data = os.read(self._fd, num)
+            except BlockingIOError:
+                return b""
+            if not data:
+                raise serial.SerialException("device reports readiness to read but returned no data")
+            return data
+        # Block until data arrives (or the port timeout expires), then return everything already received
+        # instead of waiting out the timeout for `num` bytes.
+        data = self._ser.read(1)
+        if data and (waiting := self._ser.in_waiting):
+            data += self._ser.read(min(waiting, num - 1))
+        return data
 
     def ping(self) -> None:
         self._ser.write(self._prefix + SerialFrame.SYNC + b"\x01\x00" + b"\x4d")
-        self._ser.flush()
 
     def write(self, packet: bytes) -> None:
         # Add header
-        pkt = self._prefix + SerialFrame.SYNC + len(packet).to_bytes(2, "little") + packet
+        pkt = self._prefix + SerialFrame.SYNC + SerialFrame._LEN.pack(len(packet)) + packet
         # Write packet to serial port
         self._ser.write(pkt)
+
+    def drain(self) -> None:
         self._ser.flush()
 
     def close(self) -> None:
+        self._fd = None
         self._ser.close()
 
     def __str__(self) -> str:
@@ -171,14 +238,18 @@ class RttPort(SerialLike):
             if len(trace_data) > 0:
                 self._modem_trace.write(trace_data)
 
-        return bytes(self._jlink.rtt_read(0, num))
+        data = bytes(self._jlink.rtt_read(0, num))
+        if not data:
+            # RTT reads never block, avoid spinning on an idle channel
+            time.sleep(RTT_IDLE_POLL)
+        return data
 
     def ping(self):
         self._jlink.rtt_write(0, SerialFrame.SYNC + b"\x01\x00" + b"\x4d")
 
     def write(self, packet: bytes):
         # Add header
-        pkt = SerialFrame.SYNC + len(packet).to_bytes(2, "little") + packet
+        pkt = SerialFrame.SYNC + SerialFrame._LEN.pack(len(packet)) + packet
         while True:
             res = self._jlink.rtt_write(0, pkt)
             if res == len(pkt):
@@ -186,6 +257,10 @@ class RttPort(SerialLike):
             pkt = pkt[res:]
             time.sleep(0.1)
 
+    def drain(self) -> None:
+        # RTT writes complete synchronously
+        pass
+
     def close(self):
         self._jlink.rtt_stop()
         self._jlink.close()
@@ -214,14 +289,17 @@ class PyOcdPort(SerialLike):
         self._down_chan = self._rtt.down_channels[0]
 
     def read_bytes(self, num):
-        return self._up_chan.read()
+        data = self._up_chan.read()
+        if not data:
+            time.sleep(RTT_IDLE_POLL)
+        return data
 
     def ping(self):
         self._down_chan.write(SerialFrame.SYNC + b"\x01\x00" + b"\x4d")
 
     def write(self, packet: bytes):
         # Add header
-        pkt = SerialFrame.SYNC + len(packet).to_bytes(2, "little") + packet
+        pkt = SerialFrame.SYNC + SerialFrame._LEN.pack(len(packet)) + packet
         while True:
             res = self._down_chan.write(pkt)
             if res == len(pkt):
@@ -229,6 +307,10 @@ class PyOcdPort(SerialLike):
             pkt = pkt[res:]
             time.sleep(0.1)
 
+    def drain(self) -> None:
+        # RTT writes complete synchronously
+        pass
+
     def close(self):
         self._session.close()
 
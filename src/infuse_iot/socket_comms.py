@@ -1,22 +1,112 @@
 #!/usr/bin/env python3
 
 import enum
+import errno
 import json
+import select
+import selectors
 import socket
 import struct
 import sys
 import time
-from collections.abc import Generator
+from collections import deque
+from collections.abc import Generator, Iterable
 from contextlib import contextmanager
-from typing import cast
+from typing import NamedTuple, cast
 
 from typing_extensions import Self
 
 from infuse_iot.common import InfuseType
-from infuse_iot.epacket.packet import HopReceived, PacketOutput, PacketReceived
+from infuse_iot.epacket.interface import ID as Interface
+from infuse_iot.epacket.interface import Address
+from infuse_iot.epacket.packet import Auth, HopReceived, PacketOutput, PacketReceived
 from infuse_iot.generated.tdf_definitions import readings
 from infuse_iot.tdf import TDF
 
+# Largest possible UDP payload, receive buffers of this size can never truncate a datagram
+MAX_DGRAM = 65507
+# Size limit when batching notifications into a datagram. Well below the default macOS
+# UDP limit (9216 bytes), and avoids large multicast datagrams being fragmented.
+MAX_TX_BATCH = 8192
+# Kernel socket buffer size, large enough to absorb bursts of notifications without drops
+SOCKET_BUFFER_SIZE = 2 << 20
+
+
+# Wire record header: message type, metadata length, raw payload length.
+# Each datagram contains one or more records of the form `header | metadata | payload`.
+# Metadata is JSON for most messages, while the high rate ePacket messages use the
+# binary formats below so that neither the route nor the payload pass through JSON.
+_HDR = struct.Struct("<BHH")
+# Received ePacket: packet type, number of hops
+_EPACKET_RX = struct.Struct("<BB")
+# Received hop: Infuse ID, interface, auth, key ID, GPS time, sequence, RSSI, address type, address value
+_HOP_RX = struct.Struct("<QBBIIHhBQ")
+# ePacket to send: Infuse ID, auth, packet type
+_EPACKET_TX = struct.Struct("<QBB")
+# Address type of hops received over serial
+_ADDR_SERIAL = 0xFF
+# Multicast group membership request: group address, interface address
+_MREQ = struct.Struct("4s4s")
+
+
+def _wire_record(msg_type: int, metadata: bytes, payload: bytes = b"") -> bytes:
+    return _HDR.pack(msg_type, len(metadata), len(payload)) + metadata + payload
+
+
+def _wire_iter(data: bytes | memoryview) -> Generator[tuple[int, memoryview, bytes], None, None]:
+    mv = memoryview(data)
+    offset = 0
+    while offset < len(mv):
+        msg_type, meta_len, payload_len = _HDR.unpack_from(mv, offset)
+        offset += _HDR.size
+        metadata = mv[offset : offset + meta_len]
+        offset += meta_len
+        # Payloads are copied out, `data` may be a view of a reused receive buffer
+        yield msg_type, metadata, bytes(mv[offset : offset + payload_len])
+        offset += payload_len
+
+
+_stateless_cache: dict[type, bytes] = {}
+
+
+def _stateless_wire(cls: type) -> bytes:
+    """Messages without instance state always have the same encoding, so only encode them once"""
+    encoded = _stateless_cache.get(cls)
+    if encoded is None:
+        encoded = _wire_record(cls.TYPE, json.dumps(cls().to_json()).encode("utf-8"))  # type: ignore
+        _stateless_cache[cls] = encoded
+    return encoded
+
+
+def _hop_to_wire(hop: HopReceived) -> bytes:
+    addr = hop.interface_address.val
+    if isinstance(addr, Address.BluetoothLeAddr):
+        addr_type, addr_val = addr.addr_type, addr.addr_val
+    else:
+        addr_type, addr_val = _ADDR_SERIAL, 0
+    return _HOP_RX.pack(
+        hop.infuse_id,
+        hop.interface.value,
+        hop.auth,
+        hop.key_identifier,
+        hop.gps_time,
+        hop.sequence,
+        hop.rssi,
+        addr_type,
+        addr_val,
+    )
+
+
+def _hop_from_wire(buffer: bytes | memoryview, offset: int) -> HopReceived:
+    infuse_id, interface, auth, key_id, gps_time, sequence, rssi, addr_type, addr_val = _HOP_RX.unpack_from(
+        buffer, offset
+    )
+    if addr_type == _ADDR_SERIAL:
+        addr = Address(Address.SerialAddr())
+    else:
+        addr = Address(Address.BluetoothLeAddr(addr_type, addr_val))
+    return HopReceived(infuse_id, Interface(interface), addr, Auth(auth), key_id, gps_time, sequence, rssi)
+
 
 def default_multicast_address(port: int = 8751) -> tuple[str, int]:
     return ("224.1.1.1", port)
@@ -31,6 +121,9 @@ class ClientNotification:
         KNOWN_DEVICES = 4
         COMMS_CHECK = 5
 
+    # Class has no instance state, encoding can be cached
+    STATELESS = False
+
     def to_json(self) -> dict:
         """Convert class to json dictionary"""
         raise NotImplementedError
@@ -53,6 +146,24 @@ class ClientNotification:
             return cast(Self, ClientNotificationCommsCheck.from_json(values))
         raise NotImplementedError(f"Unknown notification: {values}")
 
+    def to_wire(self) -> bytes:
+        """Convert class to binary wire record"""
+        if self.STATELESS:
+            return _stateless_wire(type(self))
+        return _wire_record(self.TYPE, json.dumps(self.to_json()).encode("utf-8"))  # type: ignore
+
+    @classmethod
+    def from_wire_record(cls, msg_type: int, metadata: bytes | memoryview, payload: bytes) -> Self:
+        """Reconstruct class from a single binary wire record"""
+        if msg_type == cls.Type.EPACKET_RECV:
+            return cast(Self, ClientNotificationEpacketReceived.from_wire_values(metadata, payload))
+        return cls.from_json(json.loads(bytes(metadata)))
+
+    @classmethod
+    def from_wire(cls, data: bytes | memoryview) -> list[Self]:
+        """Reconstruct all classes from a received datagram"""
+        return [cls.from_wire_record(*record) for record in _wire_iter(data)]
+
 
 class ClientNotificationEpacketReceived(ClientNotification):
     TYPE = ClientNotification.Type.EPACKET_RECV
@@ -68,6 +179,18 @@ class ClientNotificationEpacketReceived(ClientNotification):
     def from_json(cls, values: dict) -> Self:
         return cls(PacketReceived.from_json(values["epacket"]))
 
+    def to_wire(self) -> bytes:
+        """Convert class to binary wire record, with the payload transported as raw bytes"""
+        route = self.epacket.route
+        metadata = _EPACKET_RX.pack(self.epacket.ptype, len(route)) + b"".join(_hop_to_wire(h) for h in route)
+        return _wire_record(self.TYPE, metadata, self.epacket.payload)
+
+    @classmethod
+    def from_wire_values(cls, metadata: bytes | memoryview, payload: bytes) -> Self:
+        ptype, num_hops = _EPACKET_RX.unpack_from(metadata, 0)
+        route = [_hop_from_wire(metadata, _EPACKET_RX.size + i * _HOP_RX.size) for i in range(num_hops)]
+        return cls(PacketReceived(route, InfuseType(ptype), payload))
+
 
 class ClientNotificationObservedDevices(ClientNotification):
     TYPE = ClientNotification.Type.KNOWN_DEVICES
@@ -88,6 +211,7 @@ class ClientNotificationObservedDevices(ClientNotification):
 
 class ClientNotificationCommsCheck(ClientNotification):
     TYPE = ClientNotification.Type.COMMS_CHECK
+    STATELESS = True
 
     def __init__(self):
         pass
@@ -152,6 +276,9 @@ class GatewayRequest:
         KNOWN_DEVICES = 3
         COMMS_CHECK = 4
 
+    # Class has no instance state, encoding can be cached
+    STATELESS = False
+
     def to_json(self) -> dict:
         """Convert class to json dictionary"""
         raise NotImplementedError
@@ -171,6 +298,23 @@ class GatewayRequest:
             return cast(Self, GatewayRequestCommsCheck.from_json(values))
         raise NotImplementedError(f"Unknown request: {values}")
 
+    def to_wire(self) -> bytes:
+        """Convert class to binary wire record"""
+        if self.STATELESS:
+            return _stateless_wire(type(self))
+        return _wire_record(self.TYPE, json.dumps(self.to_json()).encode("utf-8"))  # type: ignore
+
+    @classmethod
+    def from_wire(cls, data: bytes | memoryview) -> list[Self]:
+        """Reconstruct all classes from a received datagram"""
+        output = []
+        for msg_type, metadata, payload in _wire_iter(data):
+            if msg_type == cls.Type.EPACKET_SEND:
+                output.append(cast(Self, GatewayRequestEpacketSend.from_wire_values(metadata, payload)))
+            else:
+                output.append(cls.from_json(json.loads(bytes(metadata))))
+        return output
+
 
 class GatewayRequestEpacketSend(GatewayRequest):
     """Request packet to be forwarded to device"""
@@ -187,11 +331,22 @@ class GatewayRequestEpacketSend(GatewayRequest):
     def from_json(cls, values: dict) -> Self:
         return cls(PacketOutput.from_json(values["epacket"]))
 
+    def to_wire(self) -> bytes:
+        """Convert class to binary wire record, with the payload transported as raw bytes"""
+        metadata = _EPACKET_TX.pack(self.epacket.infuse_id, self.epacket.auth, self.epacket.ptype)
+        return _wire_record(self.TYPE, metadata, self.epacket.payload)
+
+    @classmethod
+    def from_wire_values(cls, metadata: memoryview, payload: bytes) -> Self:
+        infuse_id, auth, ptype = _EPACKET_TX.unpack_from(metadata, 0)
+        return cls(PacketOutput(infuse_id, Auth(auth), InfuseType(ptype), payload))
+
 
 class GatewayRequestObservedDevices(GatewayRequest):
     """Request list of known devices"""
 
     TYPE = GatewayRequest.Type.KNOWN_DEVICES
+    STATELESS = True
 
     def __init__(self):
         pass
@@ -208,6 +363,7 @@ class GatewayRequestCommsCheck(GatewayRequest):
     """Request packet to be forwarded to device"""
 
     TYPE = GatewayRequest.Type.COMMS_CHECK
+    STATELESS = True
 
     def __init__(self):
         pass
@@ -268,34 +424,92 @@ class GatewayRequestConnectionRelease(GatewayRequestConnection):
     TYPE = GatewayRequestConnection.Type.CONNECTION_RELEASE
 
 
+class RawNotification(NamedTuple):
+    """Notification that has not been decoded into its `ClientNotification` class"""
+
+    type: ClientNotification.Type
+    # Packet type and first hop of `ClientNotification.Type.EPACKET_RECV`, otherwise `None`.
+    # The first hop is also `None` for packets received without a route.
+    ptype: InfuseType | None
+    source_id: int | None
+    source_interface: Interface | None
+    payload: bytes
+
+
 class LocalServer:
     def __init__(self, multicast_address):
         # Multicast output socket
         self._output_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         self._output_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        self._output_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
         self._output_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton("127.0.0.1"))
         self._output_addr = multicast_address
         if sys.platform == "win32":
             # On Windows, trying to send to a multicast socket that has no receivers in the group will result in an
             # error. To avoid this, we add the output socket to the group, even though we don't expect to receive
             # anything on it.
-            mreq = struct.pack("4s4s", socket.inet_aton(multicast_address[0]), socket.inet_aton("127.0.0.1"))
+            mreq = _MREQ.pack(socket.inet_aton(multicast_address[0]), socket.inet_aton("127.0.0.1"))
             self._output_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
         # Single input socket
         unicast_address = ("localhost", multicast_address[1] + 1)
         self._input_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._input_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
         self._input_sock.bind(unicast_address)
         self._input_sock.settimeout(0.2)
+        # Requests received in the same datagram that are yet to be returned
+        self._pending: deque[GatewayRequest] = deque()
+        # Reused receive buffer
+        self._rx_buf = bytearray(MAX_DGRAM)
+        self._rx_view = memoryview(self._rx_buf)
 
     def broadcast(self, notification: ClientNotification):
-        self._output_sock.sendto(json.dumps(notification.to_json()).encode("utf-8"), self._output_addr)
-
-    def receive(self) -> GatewayRequest | None:
+        self._output_sock.sendto(notification.to_wire(), self._output_addr)
+
+    def broadcast_many(self, notifications: Iterable[ClientNotification]):
+        """Broadcast multiple notifications, packing up to `MAX_TX_BATCH` bytes into each datagram"""
+        batch: list[bytes] = []
+        batch_len = 0
+        for notification in notifications:
+            encoded = notification.to_wire()
+            if batch and batch_len + len(encoded) > MAX_TX_BATCH:
+                self._send_batch(batch)
+                batch = []
+                batch_len = 0
+            batch.append(encoded)
+            batch_len += len(encoded)
+        if batch:
+            self._send_batch(batch)
+
+    def _send_batch(self, batch: list[bytes]):
+        if len(batch) == 1:
+            self._output_sock.sendto(batch[0], self._output_addr)
+            return
+        try:
+            self._output_sock.sendto(b"".join(batch), self._output_addr)
+        except OSError as e:
+            if e.errno != errno.EMSGSIZE:
+                raise
+            # Datagram exceeds the platform limit, fall back to one notification per datagram
+            for encoded in batch:
+                self._output_sock.sendto(encoded, self._output_addr)
+
+    def fileno(self) -> int:
+        """Request socket descriptor, for `select` once `receive(block=False)` has returned None"""
+        return self._input_sock.fileno()
+
+    def receive(self, block: bool = True) -> GatewayRequest | None:
+        """Receive the next request, optionally returning immediately if none is available"""
+        if self._pending:
+            return self._pending.popleft()
+        if not block and not select.select([self._input_sock], [], [], 0)[0]:
+            return None
         try:
-            data, _ = self._input_sock.recvfrom(8192)
+            nbytes, _ = self._input_sock.recvfrom_into(self._rx_buf)
         except TimeoutError:
             return None
-        return GatewayRequest.from_json(json.loads(data.decode("utf-8")))
+        data = self._rx_view[:nbytes]
+        self._pending.extend(GatewayRequest.from_wire(data))
+        return self._pending.popleft() if self._pending else None
 
     def close(self):
         self._input_sock.close()
@@ -303,35 +517,81 @@ class LocalServer:
 
 
 class LocalClient:
+    # Maximum number of datagrams read per wakeup
+    RX_BATCH = 64
+
     def __init__(self, multicast_address, rx_timeout=0.2):
         # Multicast input socket
         self._input_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         self._input_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._input_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
         if sys.platform == "win32":
             self._input_sock.bind(("127.0.0.1", multicast_address[1]))
         else:
             self._input_sock.bind(multicast_address)
-        mreq = struct.pack("4s4s", socket.inet_aton(multicast_address[0]), socket.inet_aton("127.0.0.1"))
+        mreq = _MREQ.pack(socket.inet_aton(multicast_address[0]), socket.inet_aton("127.0.0.1"))
         self._input_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        self._input_sock.settimeout(rx_timeout)
+        # Non-blocking so that all queued datagrams can be drained on each wakeup
+        self._input_sock.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._input_sock, selectors.EVENT_READ)
+        self._rx_timeout = rx_timeout
         # Unicast output socket
         self._output_addr = ("localhost", multicast_address[1] + 1)
         self._output_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._output_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        # Notification records received in the same datagram that are yet to be returned
+        self._pending: deque[tuple[int, bytes, bytes]] = deque()
+        # Reused receive buffer
+        self._rx_buf = bytearray(MAX_DGRAM)
+        self._rx_view = memoryview(self._rx_buf)
         # Connection context
         self._connection_id = None
 
     def set_rx_timeout(self, timeout):
-        self._input_sock.settimeout(timeout)
+        self._rx_timeout = timeout
 
     def send(self, request: GatewayRequest):
-        self._output_sock.sendto(json.dumps(request.to_json()).encode("utf-8"), self._output_addr)
+        self._output_sock.sendto(request.to_wire(), self._output_addr)
+
+    def _receive_records(self) -> bool:
+        if not self._selector.select(self._rx_timeout):
+            return False
+        # Drain the datagrams that are already queued, up to a limit to bound latency
+        for _ in range(self.RX_BATCH):
+            try:
+                nbytes, _ = self._input_sock.recvfrom_into(self._rx_buf)
+            except BlockingIOError:
+                break
+            # Multiple notifications can be present from LocalServer.broadcast_many.
+            # Metadata is copied out of the receive buffer, decoding is deferred until requested.
+            for msg_type, metadata, payload in _wire_iter(self._rx_view[:nbytes]):
+                self._pending.append((msg_type, bytes(metadata), payload))
+        return len(self._pending) > 0
 
     def receive(self) -> ClientNotification | None:
-        try:
-            data, _ = self._input_sock.recvfrom(8192)
-        except TimeoutError:
+        if not self._pending and not self._receive_records():
             return None
-        return ClientNotification.from_json(json.loads(data.decode("utf-8")))
+        return ClientNotification.from_wire_record(*self._pending.popleft())
+
+    def receive_raw(self) -> RawNotification | None:
+        """Receive the next notification without constructing the full notification class"""
+        if not self._pending and not self._receive_records():
+            return None
+        msg_type, metadata, payload = self._pending.popleft()
+        if msg_type != ClientNotification.Type.EPACKET_RECV:
+            return RawNotification(ClientNotification.Type(msg_type), None, None, None, payload)
+        ptype, num_hops = _EPACKET_RX.unpack_from(metadata, 0)
+        if num_hops == 0:
+            return RawNotification(ClientNotification.Type.EPACKET_RECV, InfuseType(ptype), None, None, payload)
+        source_id, source_interface = _HOP_RX.unpack_from(metadata, _EPACKET_RX.size)[:2]
+        return RawNotification(
+            ClientNotification.Type.EPACKET_RECV,
+            InfuseType(ptype),
+            source_id,
+            Interface(source_interface),
+            payload,
+        )
 
     def comms_check(self, timeout: float = 0.5) -> bool:
         expiry = time.time() + timeout
@@ -385,6 +645,7 @@ class LocalClient:
             )
             self.send(req)
         # Close the socket
+        self._selector.close()
         self._input_sock.close()
 
     def observe_announce(self) -> Generator[tuple[HopReceived, readings.announce | readings.announce_v2], None, None]:
@@ -3,14 +3,26 @@
 import copy
 import ctypes
 import enum
+import functools
+import struct
 import time
 from collections.abc import Generator
+from typing import NamedTuple
 
 from infuse_iot.definitions import tdf as tdf_defs
 from infuse_iot.generated import tdf_base
 from infuse_iot.time import InfuseTime
 
+_I24 = struct.Struct("<i")
+_EPOCH_OFFSET = InfuseTime.GPS_UNIX_OFFSET - InfuseTime.UNIX_LEAP_SECONDS
 
+
+def _epoch_to_unix(epoch_time: int) -> float:
+    """`InfuseTime.unix_time_from_epoch` without the classmethod dispatch, for the decode loop"""
+    return ((epoch_time >> 16) + _EPOCH_OFFSET) + (epoch_time & 0xFFFF) / 65536
+
+
+@functools.cache
 def unknown_tdf_factory(tdf_id: int, tdf_len: int) -> type[tdf_base.TdfReadingBase]:
     class UnknownTDF(tdf_base.TdfReadingBase):
         NAME = str(tdf_id)
@@ -78,34 +90,41 @@ class TDF:
 
         @property
         def offset(self):
-            return int.from_bytes(self._offset, byteorder="little", signed=True)
-
-    class Reading:
-        def __init__(
-            self,
-            tdf_id: int,
-            reading_time: None | float,
-            period: None | float,
-            base_idx: None | int,
-            data: list[tdf_base.TdfReadingBase],
-        ):
-            self.id = tdf_id
-            self.time = reading_time
-            self.period = period
-            self.base_idx = base_idx
-            self.data = data
+            # Sign extend the 24 bit value to 32 bits
+            b = bytes(self._offset)
+            return _I24.unpack(b + (b"\xff" if b[2] & 0x80 else b"\x00"))[0]
+
+    # Header sizes, evaluated once rather than on every decoded reading
+    _CORE_SZ = ctypes.sizeof(CoreHeader)
+    _ARRAY_SZ = ctypes.sizeof(ArrayHeader)
+    _ABS_SZ = ctypes.sizeof(AbsoluteTime)
+    _REL_SZ = ctypes.sizeof(RelativeTime)
+    _EREL_SZ = ctypes.sizeof(ExtendedRelativeTime)
+
+    class Reading(NamedTuple):
+        id: int
+        time: None | float
+        period: None | float
+        base_idx: None | int
+        data: list[tdf_base.TdfReadingBase]
 
     def __init__(self):
         pass
 
     @staticmethod
-    def _buffer_pull(buffer: bytes, ctype: type[ctypes.LittleEndianStructure]):
-        v = ctype.from_buffer_copy(buffer)
-        b = buffer[ctypes.sizeof(ctype) :]
-        return v, b
+    def _array_decode(
+        id_type: type[tdf_base.TdfReadingBase], buffer: memoryview, tdf_len: int, num: int
+    ) -> list[tdf_base.TdfReadingBase]:
+        if ctypes.sizeof(id_type) == tdf_len:
+            # Fixed size readings, parse the complete array with a single call.
+            # Array elements reference the storage of the array, so no further copies are made.
+            return list((num * id_type).from_buffer_copy(buffer))
+        return [id_type.from_buffer_consume(buffer[x : x + tdf_len]) for x in range(0, num * tdf_len, tdf_len)]
 
     @classmethod
-    def _diff_expand(cls, buffer: bytes, tdf_len: int, diff_type: DiffType, diff_num: int) -> tuple[int, bytes]:
+    def _diff_expand(
+        cls, buffer: bytes | memoryview, tdf_len: int, diff_type: DiffType, diff_num: int
+    ) -> tuple[int, bytes]:
         t_in: type[ctypes._SimpleCData]
         t_diff: type[ctypes._SimpleCData]
         if diff_type == cls.DiffType.DIFF_16_8:
@@ -146,9 +165,13 @@ class TDF:
 
     def decode(self, buffer: bytes, no_defs: bool = False) -> Generator[Reading, None, None]:
         buffer_time = None
+        # Walk the buffer by offset, slices of a memoryview do not copy the underlying data
+        mv = memoryview(buffer)
+        off = 0
 
-        while len(buffer) > 3:
-            header, buffer = self._buffer_pull(buffer, self.CoreHeader)
+        while len(mv) - off > 3:
+            header = self.CoreHeader.from_buffer_copy(mv, off)
+            off += self._CORE_SZ
             time_flags = header.id_flags & self.flags.TIMESTAMP_MASK
 
             if header.id_flags in [0x0000, 0xFFFF]:
@@ -163,71 +186,57 @@ class TDF:
                 except KeyError:
                     id_type = unknown_tdf_factory(tdf_id, header.len)
 
-            if time_flags == self.flags.TIMESTAMP_NONE:
-                reading_time = None
-            elif time_flags == self.flags.TIMESTAMP_ABSOLUTE:
-                t, buffer = self._buffer_pull(buffer, self.AbsoluteTime)
-                buffer_time = t.seconds * 65536 + t.subseconds
-                reading_time = InfuseTime.unix_time_from_epoch(buffer_time)
-            elif time_flags == self.flags.TIMESTAMP_RELATIVE:
-                t, buffer = self._buffer_pull(buffer, self.RelativeTime)
-                buffer_time += t.offset
-                reading_time = InfuseTime.unix_time_from_epoch(buffer_time)
-            elif time_flags == self.flags.TIMESTAMP_EXTENDED_RELATIVE:
-                t, buffer = self._buffer_pull(buffer, self.ExtendedRelativeTime)
-                buffer_time += t.offset
-                reading_time = InfuseTime.unix_time_from_epoch(buffer_time)
-            else:
-                raise RuntimeError("Unreachable time option")
+            buffer_time, reading_time, off = _TIME_DECODERS[time_flags](mv, off, buffer_time)
 
             array_header = None
             base_idx = None
             array_type = header.id_flags & self.flags.ARRAY_MASK
             if array_type == self.flags.DIFF_ARRAY:
-                array_header, buffer = self._buffer_pull(buffer, self.ArrayHeader)
+                array_header = self.ArrayHeader.from_buffer_copy(mv, off)
+                off += self._ARRAY_SZ
                 diff_type = array_header.num >> 6
                 diff_num = array_header.num & 0x3F
 
-                total_len, expanded = self._diff_expand(buffer, header.len, self.DiffType(diff_type), diff_num)
-                buffer = buffer[total_len:]
+                total_len, expanded = self._diff_expand(mv[off:], header.len, self.DiffType(diff_type), diff_num)
+                off += total_len
                 if buffer_time is None:
                     t_now = int(time.time() * 65536)
-                    reading_time = InfuseTime.unix_time_from_epoch(t_now)
+                    reading_time = _epoch_to_unix(t_now)
                 else:
-                    reading_time = InfuseTime.unix_time_from_epoch(buffer_time)
+                    reading_time = _epoch_to_unix(buffer_time)
+                expanded_mv = memoryview(expanded)
                 data = [
-                    id_type.from_buffer_consume(expanded[x : x + header.len]) for x in range(0, total_len, header.len)
+                    id_type.from_buffer_consume(expanded_mv[x : x + header.len])
+                    for x in range(0, total_len, header.len)
                 ]
             elif array_type == self.flags.TIME_ARRAY:
-                array_header, buffer = self._buffer_pull(buffer, self.ArrayHeader)
+                array_header = self.ArrayHeader.from_buffer_copy(mv, off)
+                off += self._ARRAY_SZ
                 total_len = array_header.num * header.len
-                total_data = buffer[:total_len]
-                buffer = buffer[total_len:]
+                total_data = mv[off : off + total_len]
+                off += total_len
 
                 if buffer_time is None:
                     t_now = int(time.time() * 65536)
-                    reading_time = InfuseTime.unix_time_from_epoch(t_now)
+                    reading_time = _epoch_to_unix(t_now)
                 else:
-                    reading_time = InfuseTime.unix_time_from_epoch(buffer_time)
-                data = [
-                    id_type.from_buffer_consume(total_data[x : x + header.len]) for x in range(0, total_len, header.len)
-                ]
+                    reading_time = _epoch_to_unix(buffer_time)
+                data = self._array_decode(id_type, total_data, header.len, array_header.num)
             elif array_type == self.flags.IDX_ARRAY:
-                array_header, buffer = self._buffer_pull(buffer, self.ArrayHeader)
+                array_header = self.ArrayHeader.from_buffer_copy(mv, off)
+                off += self._ARRAY_SZ
                 total_len = array_header.num * header.len
-                total_data = buffer[:total_len]
-                buffer = buffer[total_len:]
+                total_data = mv[off : off + total_len]
+                off += total_len
 
                 if time_flags != self.flags.TIMESTAMP_NONE:
                     assert buffer_time is not None
-                    reading_time = InfuseTime.unix_time_from_epoch(buffer_time)
+                    reading_time = _epoch_to_unix(buffer_time)
                 base_idx = array_header.period
-                data = [
-                    id_type.from_buffer_consume(total_data[x : x + header.len]) for x in range(0, total_len, header.len)
-                ]
+                data = self._array_decode(id_type, total_data, header.len, array_header.num)
             else:
-                data_bytes = buffer[: header.len]
-                buffer = buffer[header.len :]
+                data_bytes = mv[off : off + header.len]
+                off += header.len
 
                 data = [id_type.from_buffer_consume(data_bytes)]
 
@@ -238,6 +247,37 @@ class TDF:
             yield self.Reading(tdf_id, reading_time, period, base_idx, data)
 
 
+def _time_none(mv: memoryview, off: int, buffer_time: int | None) -> tuple[int | None, float | None, int]:
+    return buffer_time, None, off
+
+
+def _time_absolute(mv: memoryview, off: int, buffer_time: int | None) -> tuple[int | None, float | None, int]:
+    t = TDF.AbsoluteTime.from_buffer_copy(mv, off)
+    buffer_time = t.seconds * 65536 + t.subseconds
+    return buffer_time, _epoch_to_unix(buffer_time), off + TDF._ABS_SZ
+
+
+def _time_relative(mv: memoryview, off: int, buffer_time: int | None) -> tuple[int | None, float | None, int]:
+    t = TDF.RelativeTime.from_buffer_copy(mv, off)
+    buffer_time += t.offset  # type: ignore
+    return buffer_time, _epoch_to_unix(buffer_time), off + TDF._REL_SZ  # type: ignore
+
+
+def _time_extended_relative(mv: memoryview, off: int, buffer_time: int | None) -> tuple[int | None, float | None, int]:
+    t = TDF.ExtendedRelativeTime.from_buffer_copy(mv, off)
+    buffer_time += t.offset  # type: ignore
+    return buffer_time, _epoch_to_unix(buffer_time), off + TDF._EREL_SZ  # type: ignore
+
+
+# Timestamp decoders for each value of `TDF.flags.TIMESTAMP_MASK`
+_TIME_DECODERS = {
+    TDF.flags.TIMESTAMP_NONE.value: _time_none,
+    TDF.flags.TIMESTAMP_ABSOLUTE.value: _time_absolute,
+    TDF.flags.TIMESTAMP_RELATIVE.value: _time_relative,
+    TDF.flags.TIMESTAMP_EXTENDED_RELATIVE.value: _time_extended_relative,
+}
+
+
 if __name__ == "__main__":
     import sys
 
@@ -2,6 +2,8 @@
 
 import datetime
 import enum
+import functools
+import math
 
 
 class InfuseTimeSource:
@@ -33,9 +35,7 @@ class InfuseTime:
 
     @classmethod
     def unix_time_from_epoch(cls, epoch_time: int) -> float:
-        whole = epoch_time // 65536
-        partial = epoch_time % 65536
-        return cls.unix_time_from_gps_seconds(whole) + (partial / 65536)
+        return ((epoch_time >> 16) + cls.GPS_UNIX_OFFSET - cls.UNIX_LEAP_SECONDS) + (epoch_time & 0xFFFF) / 65536
 
     @classmethod
     def gps_seconds_from_unix(cls, unix_seconds: int) -> int:
@@ -54,5 +54,19 @@ class InfuseTime:
 
     @classmethod
     def utc_time_string_log(cls, unix_time: float) -> str:
-        obj = datetime.datetime.fromtimestamp(unix_time, datetime.timezone.utc)
-        return obj.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        # Split into seconds and microseconds with the same rounding as `datetime.fromtimestamp`
+        frac, whole = math.modf(unix_time)
+        us = round(frac * 1e6)
+        if us >= 1000000:
+            whole += 1
+            us -= 1000000
+        elif us < 0:
+            whole -= 1
+            us += 1000000
+        return f"{_utc_second_string(int(whole))}.{us:06d}"
+
+
+@functools.lru_cache(maxsize=1024)
+def _utc_second_string(unix_seconds: int) -> str:
+    obj = datetime.datetime.fromtimestamp(unix_seconds, datetime.timezone.utc)
+    return obj.strftime("%Y-%m-%dT%H:%M:%S")
@@ -11,8 +11,7 @@ from infuse_iot.commands import InfuseCommand
 from infuse_iot.common import InfuseType
 from infuse_iot.epacket import interface
 from infuse_iot.socket_comms import (
-    ClientNotificationConnectionDropped,
-    ClientNotificationEpacketReceived,
+    ClientNotification,
     GatewayRequestConnectionRequest,
     LocalClient,
 )
@@ -49,24 +48,24 @@ class SubCommand(InfuseCommand):
             with self._client.connection(self._id, types, self._conn_timeout) as _:
                 Console.log_info(f"Connected to {self._id:016x} ({types.name})")
                 while True:
-                    evt = self._client.receive()
+                    # Only the packet type, source and payload are required
+                    evt = self._client.receive_raw()
                     if evt is None:
                         continue
-                    if isinstance(evt, ClientNotificationConnectionDropped):
+                    if evt.type == ClientNotification.Type.CONNECTION_DROPPED:
                         Console.log_error(f"Connection to {self._id:016x} lost")
                         break
-                    if not isinstance(evt, ClientNotificationEpacketReceived):
+                    if evt.type != ClientNotification.Type.EPACKET_RECV:
                         continue
-                    source = evt.epacket.route[0]
-                    if source.infuse_id != self._id:
+                    if evt.source_id != self._id:
                         continue
-                    if source.interface != interface.ID.BT_CENTRAL:
+                    if evt.source_interface != interface.ID.BT_CENTRAL:
                         continue
 
-                    if evt.epacket.ptype == InfuseType.SERIAL_LOG:
-                        print(evt.epacket.payload.decode("utf-8"), end="")
-                    if evt.epacket.ptype == InfuseType.TDF:
-                        for tdf in self._decoder.decode(evt.epacket.payload):
+                    if evt.ptype == InfuseType.SERIAL_LOG:
+                        print(evt.payload.decode("utf-8"), end="")
+                    if evt.ptype == InfuseType.TDF:
+                        for tdf in self._decoder.decode(evt.payload):
                             t = tdf.data[-1]
                             t_str = f"{tdf.time:.3f}" if tdf.time else "N/A"
                             if len(tdf.data) > 1:
@@ -6,12 +6,15 @@ __author__ = "Jordan Yates"
 __copyright__ = "Copyright 2024, Embeint Holdings Pty Ltd"
 
 import base64
+import concurrent.futures
+import functools
 import glob
 import pathlib
 import sys
 from typing import Any
 from uuid import UUID
 
+import httpx
 from tabulate import tabulate
 
 import infuse_iot.api_client.models as models
@@ -56,17 +59,33 @@ from infuse_iot.util.console import choose_one, user_confirm, user_response
 from infuse_iot.util.version import Version
 
 
+@functools.lru_cache(maxsize=1)
+def _auth_header(api_key: str | None) -> tuple[str, str]:
+    """Authentication header, querying the keyring at most once per process"""
+    return ("x-api-key", f"Bearer {api_key if api_key else get_api_key()}")
+
+
 class CloudSubCommand:
     def __init__(self, args):
         self.args = args
+        self._client: Client | None = None
 
     def run(self):
         """Run cloud sub-command"""
 
     def client(self):
-        """Get API client object ready to use"""
-        bearer = self.args.api_key if self.args.api_key else get_api_key()
-        return Client(base_url="https://api.infuse-iot.com").with_headers({"x-api-key": f"Bearer {bearer}"})
+        """Get API client object ready to use
+
+        The client is constructed once per command so that every request made
+        through it shares the same pool of keep-alive connections.
+        """
+        if self._client is None:
+            self._client = Client(
+                base_url="https://api.infuse-iot.com",
+                headers=dict([_auth_header(self.args.api_key)]),
+                httpx_args={"limits": httpx.Limits(max_keepalive_connections=10, keepalive_expiry=30)},
+            )
+        return self._client
 
 
 class Organisations(CloudSubCommand):
@@ -146,8 +165,12 @@ class Boards(CloudSubCommand):
         orgs = get_all_organisations.sync(client=client)
         if isinstance(orgs, models.Error) or orgs is None:
             sys.exit(f"Organisation query failed {orgs}")
-        for org in orgs:
-            boards = get_boards.sync(client=client, organisation_id=org.id)
+        # Query each organisation concurrently over the shared connection pool
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            org_boards = pool.map(lambda org: get_boards.sync(client=client, organisation_id=org.id), orgs)
+            results = list(zip(orgs, org_boards, strict=True))
+
+        for org, boards in results:
             if isinstance(boards, models.Error) or boards is None:
                 sys.exit(f"Boards query failed {boards}")
 
@@ -22,12 +22,36 @@ class SubCommand(InfuseCommand):
         parser.add_argument("--start", type=str, default="2024-01-01", help="Display data after")
         parser.add_argument("--field", type=str, help="Single column to plot")
         parser.add_argument("--group", action="store_true", help="Group all lines onto a single plot")
+        parser.add_argument(
+            "--max-points",
+            type=int,
+            default=10_000,
+            help="Downsample each file to approximately this many points (0 to disable)",
+        )
 
     def __init__(self, args):
         self.files = args.files
         self.field = args.field
         self.start = args.start
         self.group = args.group
+        self.max_points = args.max_points
+
+    def _downsample(self, df):
+        """Reduce the number of rows, retaining the minimum and maximum of each column in every bucket"""
+        if self.max_points <= 0 or len(df) <= self.max_points:
+            return df
+        df = df.reset_index(drop=True)
+        values = df.iloc[:, 1:].select_dtypes("number")
+        values = values.loc[:, values.notna().any()].ffill().bfill()
+        if values.empty:
+            # Nothing to preserve the envelope of, fall back to a fixed stride
+            return df.iloc[:: -(-len(df) // self.max_points)]
+        # Each bucket contributes up to two rows per column
+        num_buckets = max(self.max_points // (2 * len(values.columns)), 1)
+        bucket_size = -(-len(df) // num_buckets)
+        buckets = values.groupby(df.index // bucket_size)
+        keep = set(buckets.idxmin().to_numpy().ravel()) | set(buckets.idxmax().to_numpy().ravel())
+        return df.iloc[sorted(keep)]
 
     def run(self):
         import pandas as pd
@@ -40,22 +64,43 @@ class SubCommand(InfuseCommand):
         if self.group:
             fig = go.Figure()
 
-        for file in self.files:
-            df = pd.read_csv(file)
+        # Parse the start time once so filtering is a datetime comparison
+        start = pd.Timestamp(self.start)
 
-            mask = df["time"] >= self.start
-            filtered_df = df.loc[mask]
+        for file in self.files:
+            # Only parse the columns that will be displayed, filtering in chunks
+            # to avoid materialising rows before the start time in memory.
+            usecols = ["time", self.field] if self.field else None
+            reader = pd.read_csv(file, usecols=usecols, parse_dates=["time"], chunksize=1_000_000)
+            chunks = [chunk.loc[chunk["time"] >= start] for chunk in reader]
+            if chunks:
+                filtered_df = self._downsample(pd.concat(chunks))
+            else:
+                # Header only, no chunks are produced
+                filtered_df = pd.read_csv(file, usecols=usecols, parse_dates=["time"], nrows=0)
 
-            y_data = filtered_df[self.field] if self.field else filtered_df.columns.values[1:]
+            y_cols = [self.field] if self.field else filtered_df.columns[1:].tolist()
             if self.group:
                 assert fig is not None
-                fig.add_trace(go.Scatter(x=filtered_df["time"], y=y_data, name=str(file.name), mode="lines"))
+                file_name = str(file.name)
+                x_data = filtered_df["time"]
+                traces = [
+                    go.Scattergl(
+                        x=x_data,
+                        y=filtered_df[col],
+                        name=file_name if len(y_cols) == 1 else f"{file_name}: {col}",
+                        mode="lines",
+                    )
+                    for col in y_cols
+                ]
+                fig.add_traces(traces)
             else:
                 fig = px.line(
                     filtered_df,
                     x="time",
-                    y=y_data,
+                    y=self.field if self.field else y_cols,
                     title=str(file),
+                    render_mode="webgl",
                 )
                 figures.append(dcc.Graph(figure=fig))
 
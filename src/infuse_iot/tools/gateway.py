@@ -6,11 +6,12 @@ __author__ = "Jordan Yates"
 __copyright__ = "Copyright 2024, Embeint Holdings Pty Ltd"
 
 import argparse
-import base64
+import binascii
 import ctypes
 import io
-import queue
-import random
+import os
+import select
+import struct
 import sys
 import threading
 import time
@@ -36,6 +37,7 @@ from infuse_iot.epacket.packet import (
     PacketOutputRouted,
     PacketReceived,
 )
+from infuse_iot.rpc import SECURITY_STATE_RSP
 from infuse_iot.serial_comms import PyOcdPort, RttPort, SerialBadNameException, SerialFrame, SerialLike, SerialPort
 from infuse_iot.socket_comms import (
     ClientNotification,
@@ -56,7 +58,10 @@ from infuse_iot.util.argparse import ValidFile, add_server_port_parser
 from infuse_iot.util.console import Console
 from infuse_iot.util.local_rpc_server import LocalRpcServer
 from infuse_iot.util.os import is_wsl
-from infuse_iot.util.threading import SignaledThread
+from infuse_iot.util.threading import SelectableEvent, SignaledThread
+
+# Memfault chunk header: chunk length, chunk counter
+_MF_HDR = struct.Struct("<HB")
 
 
 class CommonThreadState:
@@ -76,20 +81,24 @@ class CommonThreadState:
         if self.server:
             self.server.broadcast(notification)
 
-    def query_device_key(self, infuse_id: int, cb_event: threading.Event | None = None) -> bool:
-        """Query device key, returns True on success, False on failure"""
+    def notification_broadcast_many(self, notifications: list[ClientNotification]):
+        if self.server and notifications:
+            self.server.broadcast_many(notifications)
+
+    def query_device_key(self, infuse_id: int, cb_event: threading.Event | None = None) -> None:
+        """Query device key, `cb_event` is set once the key has been received"""
 
         def security_state_done(pkt: PacketReceived, _rc: int, response: bytes, challenge):
-            decoded = defs.security_state.response.vla_from_buffer_copy(response)
+            cloud_key, device_key, network_id, challenge_response_type = SECURITY_STATE_RSP.unpack_from(response)
             try:
                 self.ddb.observe_security_state(
                     infuse_id,
-                    bytes(decoded.cloud_public_key),
-                    bytes(decoded.device_public_key),
-                    decoded.network_id,
+                    cloud_key,
+                    device_key,
+                    network_id,
                     challenge,
-                    decoded.challenge_response_type,
-                    bytes(decoded.challenge_response),
+                    challenge_response_type,
+                    bytes(response[SECURITY_STATE_RSP.size :]),
                 )
             except DeviceKeyQueryFailed as e:
                 Console.log_error(f"Failed to query key for {e.infuse_id:016x}: {e.content}")
@@ -105,81 +114,71 @@ class CommonThreadState:
                 if key.id == defs.rpc_enum_key_id.SECONDARY_REMOTE_PUBLIC_KEY:
                     self.ddb.observe_secondary_remote_public_key(infuse_id, bytes(key.key))
 
-        def run_cmd_pkt(cmd_pkt: PacketOutputRouted) -> bool:
+        def run_cmd_pkt(cmd_pkt: PacketOutputRouted) -> None:
             encrypted = cmd_pkt.to_serial(self.ddb)
             # Write to serial port
             Console.log_tx(cmd_pkt.ptype, len(encrypted))
             self.port.write(encrypted)
-            if cb_event is not None:
-                # Wait for the response
-                return cb_event.wait(1.0)
-            return True
 
         # Run security_state RPC
-        challenge = random.randbytes(16)
+        challenge = os.urandom(16)
         cmd_pkt = self.rpc.generate_addressed(
             infuse_id, defs.security_state.COMMAND_ID, challenge, Auth.NETWORK, security_state_done, challenge
         )
-        if not run_cmd_pkt(cmd_pkt):
-            return False
+        run_cmd_pkt(cmd_pkt)
 
         if self.ddb.has_local_root:
             # Query other public keys from the device
             cmd_pkt = self.rpc.generate_addressed(
                 infuse_id, defs.security_public_keys.COMMAND_ID, b"\x00", Auth.NETWORK, public_keys_done, None
             )
-            if not run_cmd_pkt(cmd_pkt):
-                return False
-        return True
+            run_cmd_pkt(cmd_pkt)
 
 
 class SerialRxThread(SignaledThread):
     """Receive serial frames from the serial port"""
 
-    def __init__(self, common: CommonThreadState, log: io.TextIOWrapper):
+    def __init__(self, common: CommonThreadState, log: io.TextIOWrapper, sig: threading.Event | None = None):
         self._common = common
-        self._reconstructor = SerialFrame.reconstructor()
-        self._reconstructor.send(None)
-        self._line = ""
+        self._reconstructor = SerialFrame.Reconstructor()
+        self._line = bytearray()
         self._log = log
         self._next_ping = 0.0
         self._tdf_decoder = tdf.TDF()
-        super().__init__(self._iter)
+        super().__init__(self._iter, sig)
 
     def _iter(self) -> None:
         # Read bytes from serial port
         rx = self._common.port.read_bytes(1024)
         if len(rx) == 0:
             return
-        for b in rx:
-            frame_byte, frame = self._reconstructor.send(b)
-            if frame and self._common.server is not None:
-                self._handle_serial_frame(frame)
-
-            if not frame_byte:
-                c = chr(b)
-                if c == "\n":
-                    if self._log is not None:
-                        self._log.write(self._line)
-                    print(self._line)
-                    self._line = ""
-                else:
-                    self._line += c
+        frames, text = self._reconstructor.feed(rx)
+        if self._common.server is not None and frames:
+            # Forward every packet received in this read to clients together
+            notifications: list[ClientNotification] = []
+            for frame in frames:
+                self._handle_serial_frame(frame, notifications)
+            self._common.notification_broadcast_many(notifications)
+
+        self._line += text
+        start = 0
+        while (end := self._line.find(b"\n", start)) != -1:
+            line = self._line[start:end].decode("latin-1")
+            if self._log is not None:
+                self._log.write(line)
+            Console.write(line)
+            start = end + 1
+        del self._line[:start]
 
     def _handle_memfault_pkt(self, pkt: PacketReceived):
-        class memfault_chunk_header(ctypes.LittleEndianStructure):
-            _fields_ = [
-                ("len", ctypes.c_uint16),
-                ("cnt", ctypes.c_uint8),
-            ]
-            _pack_ = 1
-
-        p = pkt.payload
-        while len(p) > 0:
-            hdr = memfault_chunk_header.from_buffer_copy(p)
-            chunk = p[3 : 3 + hdr.len]
-            p = p[3 + hdr.len :]
-            print(f"Memfault Chunk {hdr.cnt:3d}: {base64.b64encode(chunk).decode('utf-8')}")
+        p = memoryview(pkt.payload)
+        off = 0
+        while off < len(p):
+            length, cnt = _MF_HDR.unpack_from(p, off)
+            off += _MF_HDR.size
+            chunk = p[off : off + length]
+            off += length
+            Console.write(f"Memfault Chunk {cnt:3d}: {binascii.b2a_base64(chunk, newline=False).decode('ascii')}")
 
     def _handle_local_tdf(self, pkt: PacketReceived):
         if self._common.server is None:
@@ -192,7 +191,7 @@ class SerialRxThread(SignaledThread):
                 if infuse_id:
                     self._common.notification_broadcast(ClientNotificationConnectionDropped(infuse_id))
 
-    def _handle_serial_frame(self, frame: bytearray):
+    def _handle_serial_frame(self, frame: bytearray, notifications: list[ClientNotification]):
         try:
             # Decode the serial packet
             try:
@@ -215,44 +214,65 @@ class SerialRxThread(SignaledThread):
                 Console.log_error(f"Failed to decode {len(frame)} byte packet {e}")
                 return
 
+            rpc_handle = self._common.rpc.handle
+            frame_len = len(frame)
             # Iterate over all contained subpackets
             for pkt in decoded:
-                Console.log_rx(pkt.ptype, len(frame))
+                ptype = pkt.ptype
+                Console.log_rx(ptype, frame_len)
                 # Handle any local TDFs
-                if len(pkt.route) == 1 and pkt.ptype == InfuseType.TDF:
+                if ptype == InfuseType.TDF and len(pkt.route) == 1:
                     self._handle_local_tdf(pkt)
                 # Handle any local RPC responses
-                self._common.rpc.handle(pkt)
+                if ptype == InfuseType.RPC_RSP:
+                    rpc_handle(pkt)
                 # Handle any Memfault chunks
-                if pkt.ptype == InfuseType.MEMFAULT_CHUNK:
+                elif ptype == InfuseType.MEMFAULT_CHUNK:
                     self._handle_memfault_pkt(pkt)
                 # Proactively requery keys
-                elif pkt.ptype == InfuseType.KEY_IDS:
+                elif ptype == InfuseType.KEY_IDS:
                     assert self._common.ddb.gateway is not None
                     self._common.query_device_key(self._common.ddb.gateway, None)
 
                 # Forward to clients
-                notification = ClientNotificationEpacketReceived(pkt)
-                self._common.notification_broadcast(notification)
+                notifications.append(ClientNotificationEpacketReceived(pkt))
         except (ValueError, KeyError) as e:
-            print(f"Decode failed ({e})")
+            Console.write(f"Decode failed ({e})")
 
 
 class SerialTxThread(SignaledThread):
     """Send serial frames down the serial port"""
 
+    TX_COALESCE_MAX = 4096
+    KEY_QUERY_TIMEOUT = 5.0
+
     def __init__(
         self,
         common: CommonThreadState,
+        sig: threading.Event | None = None,
     ):
         self._common = common
         self._connected: dict[int, int] = {}
-        self._queue: queue.Queue = queue.Queue()
-        super().__init__(self._iter)
-
-    def send(self, pkt):
-        """Queue packet for transmission"""
-        self._queue.put(pkt)
+        # Encrypted frames waiting to be written to the serial port
+        self._tx_buf = bytearray()
+        # Packets waiting on device key queries, in transmission order
+        self._awaiting_key: list[PacketOutputRouted] = []
+        # Outstanding device key queries and the time they expire
+        self._key_queries: dict[int, float] = {}
+        # Set by the receive thread when a queried key arrives
+        self._key_event = SelectableEvent()
+        super().__init__(self._iter, sig)
+
+    def _write(self, encrypted: bytes):
+        """Queue frame for writing, to be coalesced with other frames generated in the same iteration"""
+        self._tx_buf += encrypted
+        if len(self._tx_buf) >= self.TX_COALESCE_MAX:
+            self._flush()
+
+    def _flush(self):
+        if self._tx_buf:
+            self._common.port.write(bytes(self._tx_buf))
+            self._tx_buf.clear()
 
     def _handle_epacket_send(self, req: GatewayRequestEpacketSend):
         if self._common.ddb.gateway is None:
@@ -278,20 +298,57 @@ class SerialTxThread(SignaledThread):
                 pkt.payload,
             )
 
-        # Do we have the device public keys we need?
-        for hop in routed.route:
-            if hop.auth == Auth.DEVICE and not self._common.ddb.has_shared_key(hop.infuse_id):
-                cb_event = threading.Event()
-                if not self._common.query_device_key(hop.infuse_id, cb_event):
-                    Console.log_error("Failed to query device key for {infuse_id:016x}")
-                    return
+        # Do we have the device keys we need? Packets behind an outstanding query also wait to preserve ordering.
+        missing = [
+            hop.infuse_id
+            for hop in routed.route
+            if hop.auth == Auth.DEVICE
+            and (hop.infuse_id in self._key_queries or not self._common.ddb.has_shared_key(hop.infuse_id))
+        ]
+        if missing:
+            for infuse_id in missing:
+                if infuse_id not in self._key_queries:
+                    # Key query is written directly, preserve ordering with queued frames
+                    self._flush()
+                    self._common.query_device_key(infuse_id, self._key_event)
+                    self._key_queries[infuse_id] = time.time() + self.KEY_QUERY_TIMEOUT
+            # Hold the packet until the keys arrive instead of stalling all other transmissions
+            self._awaiting_key.append(routed)
+            return
+
+        self._send_routed(routed)
 
+    def _send_routed(self, routed: PacketOutputRouted):
         # Encode and encrypt payload
         encrypted = routed.to_serial(self._common.ddb)
 
         # Write to serial port
         Console.log_tx(routed.ptype, len(encrypted))
-        self._common.port.write(encrypted)
+        self._write(encrypted)
+
+    def _service_awaiting_key(self):
+        """Send packets whose device keys have arrived, dropping those behind a query that has expired"""
+        now = time.time()
+        # Clear completed and expired queries, the next packet for an expired ID sends a new query
+        expired = set()
+        for infuse_id, expiry in list(self._key_queries.items()):
+            if self._common.ddb.has_shared_key(infuse_id):
+                del self._key_queries[infuse_id]
+            elif now >= expiry:
+                Console.log_error(f"Failed to query device key for {infuse_id:016x}")
+                del self._key_queries[infuse_id]
+                expired.add(infuse_id)
+
+        waiting = []
+        for routed in self._awaiting_key:
+            needed = {hop.infuse_id for hop in routed.route if hop.auth == Auth.DEVICE}
+            if needed & expired:
+                continue
+            if needed & self._key_queries.keys():
+                waiting.append(routed)
+            else:
+                self._send_routed(routed)
+        self._awaiting_key = waiting
 
     def _connected_notification(self, infuse_id: int):
         rsp = ClientNotificationConnectionCreated(infuse_id, 244 - ctypes.sizeof(CtypeBtGattFrame) - 16)
@@ -337,9 +394,9 @@ class SerialTxThread(SignaledThread):
             return
 
         if not self._common.ddb.has_shared_key(infuse_id):
-            # Pro-actively query key information
-            cb_event = threading.Event()
-            self._common.query_device_key(infuse_id, cb_event)
+            # Pro-actively query key information. This runs on the receive thread, so it must not
+            # wait for the response.
+            self._common.query_device_key(infuse_id)
 
         # Notify connection success
         self._connected_notification(infuse_id)
@@ -381,7 +438,7 @@ class SerialTxThread(SignaledThread):
         )
         encrypted = cmd.to_serial(self._common.ddb)
         Console.log_tx(cmd.ptype, len(encrypted))
-        self._common.port.write(encrypted)
+        self._write(encrypted)
 
     def _handle_conn_release(self, req: GatewayRequestConnectionRelease):
         if req.infuse_id == InfuseID.GATEWAY or req.infuse_id == self._common.ddb.gateway:
@@ -407,7 +464,7 @@ class SerialTxThread(SignaledThread):
         )
         encrypted = cmd.to_serial(self._common.ddb)
         Console.log_tx(cmd.ptype, len(encrypted))
-        self._common.port.write(encrypted)
+        self._write(encrypted)
 
     def _handle_observed_devices(self):
         if self._common.server is None:
@@ -431,11 +488,22 @@ class SerialTxThread(SignaledThread):
 
     def _iter(self) -> None:
         if self._common.server is None:
-            time.sleep(1.0)
+            # Nothing to transmit, idle until terminated
+            self._sig.wait()
             return
 
-        # Loop while there are packets to send
-        while req := self._common.server.receive():
+        if self._awaiting_key:
+            # Wait for a new request, a key arriving, or the earliest key query expiring
+            timeout = min(self._key_queries.values(), default=0.0) - time.time()
+            select.select([self._common.server.fileno(), self._key_event.fileno()], [], [], max(timeout, 0.0))
+            self._key_event.clear()
+            self._service_awaiting_key()
+            req = self._common.server.receive(block=False)
+        else:
+            req = self._common.server.receive()
+
+        # Loop while there are packets to send, writing all generated frames together
+        while req is not None:
             if isinstance(req, GatewayRequestEpacketSend):
                 self._handle_epacket_send(req)
             elif isinstance(req, GatewayRequestConnectionRequest):
@@ -448,6 +516,8 @@ class SerialTxThread(SignaledThread):
                 self._handle_comms_check()
             else:
                 Console.log_error(f"Unhandled request {type(req)}")
+            req = self._common.server.receive(block=False)
+        self._flush()
 
 
 class SubCommand(InfuseCommand):
@@ -509,17 +579,20 @@ class SubCommand(InfuseCommand):
         Console.log_info(f"Port '{str(self.port)}' opened")
         # Ping the port to get the local device ID
         self.port.ping()
+        self.port.drain()
 
-        # Start threads
-        rx_thread = SerialRxThread(self._common, self.log)
-        tx_thread = SerialTxThread(self._common)
+        # Start threads, sharing a termination signal so that either thread dying stops both
+        shutdown = threading.Event()
+        rx_thread = SerialRxThread(self._common, self.log, shutdown)
+        tx_thread = SerialTxThread(self._common, shutdown)
         rx_thread.start()
         tx_thread.start()
 
         # Run until 'Ctrl+C' or a thread dies
         try:
-            while rx_thread.is_alive() and tx_thread.is_alive():
-                time.sleep(0.5)
+            # Periodic timeout keeps 'Ctrl+C' responsive on Windows
+            while not shutdown.wait(1.0):
+                pass
         except KeyboardInterrupt:
             pass
         finally:
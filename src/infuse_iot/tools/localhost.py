@@ -6,11 +6,12 @@ __author__ = "Jordan Yates"
 __copyright__ = "Copyright 2024, Embeint Holdings Pty Ltd"
 
 import asyncio
+import json
 import pathlib
 import sys
-import threading
 import time
-from typing import Any
+from collections.abc import Callable
+from typing import Any, cast
 
 from aiohttp import web
 from aiohttp.client_exceptions import WSMessageTypeError
@@ -33,6 +34,78 @@ from infuse_iot.util.argparse import add_server_port_parser
 from infuse_iot.util.console import Console
 from infuse_iot.util.threading import SignaledThread
 
+# Static device metadata column group, always displayed first
+_METADATA_COLUMN = {
+    "title": "Metadata",
+    "headerHozAlign": "center",
+    "frozen": True,
+    "columns": [
+        {
+            "title": "Device",
+            "field": "infuse_id",
+            "headerHozAlign": "center",
+        },
+        {
+            "title": "App ID",
+            "field": "application",
+            "headerHozAlign": "center",
+        },
+        {
+            "title": "Network",
+            "field": "network_id",
+            "headerHozAlign": "center",
+        },
+        {
+            "title": "Last Heard",
+            "field": "time",
+            "headerHozAlign": "center",
+        },
+        {
+            "title": "Bluetooth",
+            "headerHozAlign": "center",
+            "columns": [
+                {
+                    "title": "Address",
+                    "field": "bt_addr",
+                    "headerHozAlign": "center",
+                },
+                {
+                    "title": "RSSI (dBm)",
+                    "field": "bt_rssi",
+                    "headerVertical": "flip",
+                    "hozAlign": "right",
+                },
+            ],
+        },
+    ],
+}
+
+# Put the announce TDFs first for clarity
+_TDF_PRIORITIES = {"ANNOUNCE_V2": 0, "ANNOUNCE": 1}
+
+
+def _version_formatter(v: structs.tdf_struct_mcuboot_img_sem_ver) -> str:
+    # Special case version struct to make reading versions easier
+    return f"{v.major}.{v.minor}.{v.revision}+{v.build_num:08x}"
+
+
+def _struct_formatter(subfields: list[tuple[str, str]]) -> Callable[[Any], dict[str, str]]:
+    fmts = [(name, display_fmt.format) for name, display_fmt in subfields]
+
+    def _fmt(v: Any) -> dict[str, str]:
+        return {name: fmt(getattr(v, name)) for name, fmt in fmts}
+
+    return _fmt
+
+
+def _value_formatter(display_fmt: str, is_array: bool) -> Callable[[Any], str]:
+    fmt = display_fmt.format
+    if not is_array:
+        return fmt
+    if display_fmt == "{}":
+        return lambda v: fmt(list(v))
+    return lambda v: ",".join([fmt(x) for x in v])
+
 
 class SubCommand(InfuseCommand):
     @classmethod
@@ -41,12 +114,18 @@ class SubCommand(InfuseCommand):
         add_server_port_parser(parser)
 
     def __init__(self, args):
-        self._data_lock = threading.Lock()
-        self._columns: dict[str, dict] = {}
+        # Display state, only accessed from the event loop
+        self._columns: dict[str, list] = {}
         self._apps: set[str] = set()
         self._networks: set[str] = set()
         self._data: dict[int, dict] = {}
+        # Cached websocket message, cleared whenever the data changes
+        self._message: str | None = None
         self._port: int = args.port
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Per-TDF field formatters, only accessed from the receive thread
+        self._formatters: dict[str, list[tuple[str, Callable[[Any], Any]]]] = {}
+        self._rx_thread = SignaledThread(self.recv_thread)
 
         self._client = LocalClient(args.server_sock, 1.0)
         self._decoder = TDF()
@@ -57,77 +136,30 @@ class SubCommand(InfuseCommand):
 
         return web.FileResponse(this_folder / "localhost" / "index.html")
 
-    def websocket_message(self) -> dict:
-        self._data_lock.acquire(blocking=True)
-        columns = [
-            {
-                "title": "Metadata",
-                "headerHozAlign": "center",
-                "frozen": True,
-                "columns": [
-                    {
-                        "title": "Device",
-                        "field": "infuse_id",
-                        "headerHozAlign": "center",
-                    },
-                    {
-                        "title": "App ID",
-                        "field": "application",
-                        "headerHozAlign": "center",
-                    },
-                    {
-                        "title": "Network",
-                        "field": "network_id",
-                        "headerHozAlign": "center",
-                    },
-                    {
-                        "title": "Last Heard",
-                        "field": "time",
-                        "headerHozAlign": "center",
-                    },
+    def websocket_message(self) -> str:
+        if self._message is None:
+            columns: list[dict] = [_METADATA_COLUMN]
+            sorted_tdfs = sorted(self._columns, key=lambda x: _TDF_PRIORITIES.get(x, 2))
+
+            for tdf_name in sorted_tdfs:
+                columns.append(
                     {
-                        "title": "Bluetooth",
+                        "title": tdf_name,
+                        "field": tdf_name,
+                        "columns": self._columns[tdf_name],
                         "headerHozAlign": "center",
-                        "columns": [
-                            {
-                                "title": "Address",
-                                "field": "bt_addr",
-                                "headerHozAlign": "center",
-                            },
-                            {
-                                "title": "RSSI (dBm)",
-                                "field": "bt_rssi",
-                                "headerVertical": "flip",
-                                "hozAlign": "right",
-                            },
-                        ],
-                    },
-                ],
+                    }
+                )
+            devices = sorted(self._data.keys())
+            message = {
+                "columns": columns,
+                "rows": [self._data[d] for d in devices],
+                "tdfs": sorted(list(self._columns.keys())),
+                "apps": sorted(list(self._apps)),
+                "networks": sorted(list(self._networks)),
             }
-        ]
-        # Put the announce TDFs first for clarity
-        priorities = {"ANNOUNCE_V2": 0, "ANNOUNCE": 1}
-        sorted_tdfs = sorted(self._columns, key=lambda x: priorities.get(x, 2))
-
-        for tdf_name in sorted_tdfs:
-            columns.append(
-                {
-                    "title": tdf_name,
-                    "field": tdf_name,
-                    "columns": self._columns[tdf_name],
-                    "headerHozAlign": "center",
-                }
-            )
-        devices = sorted(self._data.keys())
-        message = {
-            "columns": columns,
-            "rows": [self._data[d] for d in devices],
-            "tdfs": sorted(list(self._columns.keys())),
-            "apps": sorted(list(self._apps)),
-            "networks": sorted(list(self._networks)),
-        }
-        self._data_lock.release()
-        return message
+            self._message = json.dumps(message)
+        return self._message
 
     async def websocket_handler(self, request: BaseRequest):
         ws = web.WebSocketResponse()
@@ -141,9 +173,7 @@ class SubCommand(InfuseCommand):
                 _ = await ws.receive_str()
 
                 # Data sent to the client
-                message = self.websocket_message()
-
-                await ws.send_json(message)
+                await ws.send_str(self.websocket_message())
 
         except (asyncio.CancelledError, ConnectionResetError, WSMessageTypeError):
             pass
@@ -193,6 +223,19 @@ class SubCommand(InfuseCommand):
             out.append(s)
         return out
 
+    def tdf_formatters(self, tdf) -> list[tuple[str, Callable[[Any], Any]]]:
+        """Field formatters matching `TdfField.val_fmt`, resolved once per TDF type"""
+        out: list[tuple[str, Callable[[Any], Any]]] = []
+        for field in tdf.iter_fields(nested_iter=False):
+            if isinstance(field.val, structs.tdf_struct_mcuboot_img_sem_ver):
+                out.append((field.field, _version_formatter))
+            elif isinstance(field.val, TdfStructBase):
+                subfields = [(cast(str, s.subfield), s.display_fmt) for s in field.val.iter_fields(field.field)]
+                out.append((field.field, _struct_formatter(subfields)))
+            else:
+                out.append((field.field, _value_formatter(field.display_fmt, isinstance(field.val, list))))
+        return out
+
     def recv_thread(self) -> None:
         msg = self._client.receive()
         if msg is None:
@@ -204,50 +247,61 @@ class SubCommand(InfuseCommand):
 
         source = msg.epacket.route[0]
 
-        self._data_lock.acquire(blocking=True)
-
-        if source.infuse_id not in self._data:
-            self._data[source.infuse_id] = {
-                "infuse_id": f"0x{source.infuse_id:016x}",
-                "application": "Unknown",
-            }
+        update: dict[str, Any] = {"time": InfuseTime.utc_time_string(time.time())}
+        new_columns: dict[str, list] = {}
 
-        self._data[source.infuse_id]["time"] = InfuseTime.utc_time_string(time.time())
         if source.interface == interface.ID.BT_ADV:
-            addr_bytes = source.interface_address.val.addr_val.to_bytes(6, "big")
-            addr_str = ":".join([f"{x:02x}" for x in addr_bytes])
-            self._data[source.infuse_id]["bt_addr"] = addr_str
-            self._data[source.infuse_id]["bt_rssi"] = source.rssi
+            update["bt_addr"] = source.interface_address.val.addr_val.to_bytes(6, "big").hex(":")
+            update["bt_rssi"] = source.rssi
 
         if source.auth == packet.Auth.NETWORK:
-            key_id_str = f"0x{source.key_identifier:06x}"
-            self._data[source.infuse_id]["network_id"] = key_id_str
-            self._networks.add(key_id_str)
+            update["network_id"] = f"0x{source.key_identifier:06x}"
 
         for tdf in self._decoder.decode(msg.epacket.payload):
             t = tdf.data[-1]
-            if t.NAME not in self._columns:
-                self._columns[t.NAME] = self.tdf_columns(t)
-            if t.NAME not in self._data[source.infuse_id]:
-                self._data[source.infuse_id][t.NAME] = {}
+            formatters = self._formatters.get(t.NAME)
+            if formatters is None:
+                formatters = self.tdf_formatters(t)
+                self._formatters[t.NAME] = formatters
+                new_columns[t.NAME] = self.tdf_columns(t)
             if t.NAME in ["ANNOUNCE", "ANNOUNCE_V2"]:
-                app_str = f"0x{t.application:08x}"
-                self._data[source.infuse_id]["application"] = app_str
-                self._apps.add(app_str)
-
-            for field in t.iter_fields(nested_iter=False):
-                if isinstance(field.val, structs.tdf_struct_mcuboot_img_sem_ver):
-                    # Special case version struct to make reading versions easier
-                    val = f"{field.val.major}.{field.val.minor}.{field.val.revision}+{field.val.build_num:08x}"
-                    self._data[source.infuse_id][t.NAME][field.field] = val
-                elif isinstance(field.val, TdfStructBase):
-                    for s in field.val.iter_fields(field.field):
-                        if s.field not in self._data[source.infuse_id][t.NAME]:
-                            self._data[source.infuse_id][t.NAME][s.field] = {}
-                        self._data[source.infuse_id][t.NAME][s.field][s.subfield] = s.val_fmt()
-                else:
-                    self._data[source.infuse_id][t.NAME][field.field] = field.val_fmt()
-        self._data_lock.release()
+                update["application"] = f"0x{t.application:08x}"
+
+            values: dict[str, Any] = update.setdefault(t.NAME, {})
+            for name, fmt in formatters:
+                values[name] = fmt(getattr(t, name))
+
+        # Hand the decoded values over to the event loop that owns the display state
+        assert self._loop is not None
+        try:
+            self._loop.call_soon_threadsafe(self._apply_update, source.infuse_id, update, new_columns)
+        except RuntimeError:
+            # Event loop closed while shutting down
+            pass
+
+    def _apply_update(self, infuse_id: int, update: dict[str, Any], new_columns: dict[str, list]) -> None:
+        row = self._data.get(infuse_id)
+        if row is None:
+            row = {
+                "infuse_id": f"0x{infuse_id:016x}",
+                "application": "Unknown",
+            }
+            self._data[infuse_id] = row
+        for key, val in update.items():
+            if isinstance(val, dict):
+                row.setdefault(key, {}).update(val)
+            else:
+                row[key] = val
+        if "application" in update:
+            self._apps.add(update["application"])
+        if "network_id" in update:
+            self._networks.add(update["network_id"])
+        self._columns.update(new_columns)
+        self._message = None
+
+    async def _start_rx_thread(self, _app: web.Application) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._rx_thread.start()
 
     def run(self):
         if not self._client.comms_check():
@@ -259,9 +313,8 @@ class SubCommand(InfuseCommand):
         app.router.add_get("/", self.handle_index)
         # Route for WebSocket
         app.router.add_get("/ws", self.websocket_handler)
-
-        rx_thread = SignaledThread(self.recv_thread)
-        rx_thread.start()
+        # Receive thread needs the event loop that run_app creates
+        app.on_startup.append(self._start_rx_thread)
 
         # Run server
         try:
@@ -269,5 +322,6 @@ class SubCommand(InfuseCommand):
         except GracefulExit:
             pass
         finally:
-            rx_thread.stop()
-        rx_thread.join(1.0)
+            self._rx_thread.stop()
+        if self._rx_thread.is_alive():
+            self._rx_thread.join(1.0)
@@ -8,8 +8,7 @@ __copyright__ = "Copyright 2024, Embeint Holdings Pty Ltd"
 import argparse
 import asyncio
 import ctypes
-import json
-import random
+import os
 from typing import Any
 
 from bleak import BleakClient, BleakScanner
@@ -33,6 +32,7 @@ from infuse_iot.epacket.packet import (
     PacketOutput,
     PacketReceived,
 )
+from infuse_iot.rpc import SECURITY_STATE_RSP
 from infuse_iot.socket_comms import (
     ClientNotification,
     ClientNotificationCommsCheck,
@@ -139,20 +139,22 @@ class MulticastHandler(asyncio.DatagramProtocol):
                 security_state_received = asyncio.Event()
 
                 def security_state_done(pkt: PacketReceived, _rc: int, response: bytes, challenge):
-                    decoded = defs.security_state.response.vla_from_buffer_copy(response)
+                    cloud_key, device_key, network_id, challenge_response_type = SECURITY_STATE_RSP.unpack_from(
+                        response
+                    )
                     self._db.observe_security_state(
                         request.infuse_id,
-                        bytes(decoded.cloud_public_key),
-                        bytes(decoded.device_public_key),
-                        decoded.network_id,
+                        cloud_key,
+                        device_key,
+                        network_id,
                         challenge,
-                        decoded.challenge_response_type,
-                        bytes(decoded.challenge_response),
+                        challenge_response_type,
+                        bytes(response[SECURITY_STATE_RSP.size :]),
                     )
                     security_state_received.set()
 
                 # Construct the Security State RPC command
-                challenge = random.randbytes(16)
+                challenge = os.urandom(16)
                 ss_pkt = self._rpc.generate_addressed(
                     request.infuse_id,
                     defs.security_state.COMMAND_ID,
@@ -223,8 +225,11 @@ class MulticastHandler(asyncio.DatagramProtocol):
             self.wrapped_broadcast(ClientNotificationConnectionFailed(request.infuse_id))
 
     def datagram_received(self, data: bytes, addr: tuple[str | Any, int]):
+        for request in GatewayRequest.from_wire(data):
+            self.request_received(request)
+
+    def request_received(self, request: GatewayRequest):
         loop = asyncio.get_event_loop()
-        request = GatewayRequest.from_json(json.loads(data.decode("utf-8")))
 
         if isinstance(request, GatewayRequestCommsCheck):
             self.wrapped_broadcast(ClientNotificationCommsCheck())
@@ -341,7 +346,7 @@ class SubCommand(InfuseCommand):
     def sync_request_handler(self):
         # Loop while there are packets to send
         while req := self.server.receive():
-            print(req)
+            Console.write(str(req))
 
     def run(self):
         asyncio.run(self.async_bt_receiver())
@@ -30,7 +30,13 @@ from infuse_iot.socket_comms import (
     LocalClient,
 )
 from infuse_iot.time import InfuseTime
-from infuse_iot.util.argparse import InfuseDeviceId, ValidFile, ValidRelease, add_server_port_parser
+from infuse_iot.util.argparse import (
+    InfuseDeviceId,
+    PositiveInt,
+    ValidFile,
+    ValidRelease,
+    add_server_port_parser,
+)
 from infuse_iot.util.crc import crc16_ccitt
 from infuse_iot.zephyr.errno import errno
 
@@ -39,8 +45,9 @@ class SubCommand(InfuseCommand):
     def __init__(self, args):
         self._client = LocalClient(args.server_sock, 1.0)
         self._conn_timeout = args.conn_timeout
+        self._ack_window: int = args.ack_window
         self._min_rssi: int | None = args.rssi
-        self._explicit_ids: list[int] = []
+        self._explicit_ids: set[int] = set()
         if args.release:
             self._release: ValidRelease = args.release
             self._single_diff = None
@@ -62,7 +69,7 @@ class SubCommand(InfuseCommand):
         self._app_id = app_meta["id"]
         self._new_ver = app_meta["version"]
         self._board_crc = crc16_ccitt(app_meta["board"].encode("utf-8"))
-        self._handled: list[int] = []
+        self._handled: set[int] = set()
         self._pending: dict[int, float] = {}
         self._missing_diffs: set[str] = set()
         self._already = 0
@@ -83,11 +90,11 @@ class SubCommand(InfuseCommand):
             self._log = open(args.log, "+a", encoding="utf-8")  # noqa: SIM115
 
         if args.id is not None:
-            self._explicit_ids.append(args.id)
+            self._explicit_ids.add(args.id)
         elif args.list is not None:
             with args.list.open("r") as f:
                 for line in f.readlines():
-                    self._explicit_ids.append(int(line.strip(), 0))
+                    self._explicit_ids.add(int(line.strip(), 0))
 
     @classmethod
     def add_parser(cls, parser):
@@ -99,6 +106,12 @@ class SubCommand(InfuseCommand):
         parser.add_argument(
             "--conn-timeout", type=int, default=10000, help="Timeout to wait for a connection to the device (ms)"
         )
+        parser.add_argument(
+            "--ack-window",
+            type=PositiveInt,
+            default=1,
+            help="Data ACK periods that can be outstanding during patch uploads",
+        )
         explicit = parser.add_mutually_exclusive_group()
         explicit.add_argument("--id", type=InfuseDeviceId, help="Single device to upgrade")
         explicit.add_argument("--list", type=ValidFile, help="File containing a list of IDs to upgrade")
@@ -143,7 +156,7 @@ class SubCommand(InfuseCommand):
             patch_file = f.read()
 
         with self._client.connection(InfuseID.GATEWAY, GatewayRequestConnectionRequest.DataType.COMMAND, 10) as _mtu:
-            rpc_client = RpcClient(self._client, _mtu, InfuseID.GATEWAY)
+            rpc_client = RpcClient(self._client, _mtu, InfuseID.GATEWAY, ack_window=self._ack_window)
             params = file_write_basic.request(rpc_enum_file_action.FILE_FOR_COPY, binascii.crc32(patch_file))
 
             print(f"Writing '{self._single_diff}' to gateway")
@@ -176,7 +189,7 @@ class SubCommand(InfuseCommand):
 
     def run_file_upload(self, live: Live, mtu: int, source: HopReceived):
         self.state_update(live, f"Uploading patch file to {source.infuse_id:016X}")
-        rpc_client = RpcClient(self._client, mtu, source.infuse_id)
+        rpc_client = RpcClient(self._client, mtu, source.infuse_id, ack_window=self._ack_window)
 
         params = file_write_basic.request(rpc_enum_file_action.APP_CPATCH, binascii.crc32(self.patch_file))
 
@@ -258,7 +271,7 @@ class SubCommand(InfuseCommand):
                         # Device could still be applying the upgrade
                         continue
                     self._pending.pop(source.infuse_id)
-                    self._handled.append(source.infuse_id)
+                    self._handled.add(source.infuse_id)
                     if v_str == self._new_ver:
                         self._updated += 1
                         result = "upgraded"
@@ -274,7 +287,7 @@ class SubCommand(InfuseCommand):
 
                 # Already running the requested version?
                 if v_str == self._new_ver:
-                    self._handled.append(source.infuse_id)
+                    self._handled.add(source.infuse_id)
                     self._already += 1
                     self.state_update(live, "Scanning")
                     if self._log:
@@ -292,7 +305,7 @@ class SubCommand(InfuseCommand):
                     diff_file = self._release.dir / "diffs" / f"0x{announce.application:08x}" / f"{v_str}.bin"
                     if not diff_file.exists():
                         self._missing_diffs.add(v_str)
-                        self._handled.append(source.infuse_id)
+                        self._handled.add(source.infuse_id)
                         self._no_diff += 1
                         self.state_update(live, "Scanning")
                         continue
@@ -300,7 +313,7 @@ class SubCommand(InfuseCommand):
                 if self._single_diff and self._single_diff != diff_file:
                     # Not the file we've copied to the gateway flash
                     self._missing_diffs.add(v_str)
-                    self._handled.append(source.infuse_id)
+                    self._handled.add(source.infuse_id)
                     self._no_diff += 1
                     self.state_update(live, "Scanning")
                     continue
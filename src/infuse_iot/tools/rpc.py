@@ -21,7 +21,7 @@ from infuse_iot.socket_comms import (
     GatewayRequestConnectionRequest,
     LocalClient,
 )
-from infuse_iot.util.argparse import InfuseDeviceId, add_server_port_parser
+from infuse_iot.util.argparse import InfuseDeviceId, PositiveInt, add_server_port_parser
 
 
 class SubCommand(InfuseCommand):
@@ -34,6 +34,12 @@ class SubCommand(InfuseCommand):
         parser.add_argument(
             "--conn-timeout", type=int, default=10000, help="Timeout to wait for a connection to the device (ms)"
         )
+        parser.add_argument(
+            "--ack-window",
+            type=PositiveInt,
+            default=1,
+            help="Data ACK periods that can be outstanding during data sends",
+        )
         command_list_parser = parser.add_subparsers(title="commands", metavar="<command>", required=True)
 
         for _, name, _ in pkgutil.walk_packages(wrappers.__path__):
@@ -82,7 +88,7 @@ class SubCommand(InfuseCommand):
                 types |= GatewayRequestConnectionRequest.DataType.LOGGING
             with self._client.connection(self._id, types, self._args.conn_timeout) as mtu:
                 self._max_payload = mtu
-                rpc_client = RpcClient(self._client, mtu, self._id, self.rx_handler)
+                rpc_client = RpcClient(self._client, mtu, self._id, self.rx_handler, self._args.ack_window)
                 rpc_client.set_timeout(self._command.command_timeout_ms())
                 params = bytes(self._command.request_struct())
 
@@ -101,6 +101,7 @@ class HexString:
         except ValueError as e:
             raise argparse.ArgumentTypeError(f"{string} is not a valid hex ID") from e
 
+
 class ServerPort:
     """Server port number to socket tuple"""
 
@@ -115,13 +116,27 @@ class ServerPort:
             raise argparse.ArgumentError(None, f"`--server-port` must be odd: {port}")
         return default_multicast_address(port)
 
+
+class PositiveInt:
+    """Integer greater than zero"""
+
+    def __new__(cls, string: str) -> int:  # type: ignore
+        try:
+            val = int(string)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f"{string} is not a valid integer") from e
+        if val <= 0:
+            raise argparse.ArgumentTypeError(f"{string} is not greater than zero")
+        return val
+
+
 def add_server_port_parser(parser: argparse.ArgumentParser, multi_port: bool = False):
     """Register `--server-port`with an argument parser. `multi_port` allows multiple port(s)"""
     parser.add_argument(
-        '--server-port',
-        dest='server_sock',
+        "--server-port",
+        dest="server_sock",
         default=[default_multicast_address()] if multi_port else default_multicast_address(),
         type=ServerPort,
-        nargs= '+' if multi_port else None,
-        help="Alternate port to use for Gateway connections (default 8751)"
+        nargs="+" if multi_port else None,
+        help="Alternate port to use for Gateway connections (default 8751)",
     )
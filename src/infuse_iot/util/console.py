@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
 
+import atexit
 import datetime
+import sys
 import threading
+from collections import deque
+from typing import Any
 
 import colorama
 
@@ -17,10 +21,110 @@ _lock = threading.Lock()
 class Console:
     """Common terminal logging functions"""
 
+    # Maximum number of pending high rate log lines, further lines are dropped
+    QUEUE_DEPTH = 1024
+    # Output for the background writer: (timestamp, colour, string, completion event).
+    # Entries without a string are flush requests, or mark where lines were dropped.
+    _pending: deque[tuple[datetime.datetime | None, Any, str | None, threading.Event | None]] = deque()
+    _cond = threading.Condition()
+    _dropped = 0
+    _running = False
+    _writer_thread: threading.Thread | None = None
+
     @staticmethod
     def init():
         """Initialise console logging"""
         colorama.init(autoreset=True)
+        if Console._writer_thread is None:
+            # All output is written from a background thread so the RX/TX threads never
+            # block on a slow terminal. Lower rate logs wait for their own line to be
+            # written, which preserves ordering with everything logged before them.
+            Console._running = True
+            Console._writer_thread = threading.Thread(target=Console._writer, daemon=True)
+            Console._writer_thread.start()
+            atexit.register(Console._shutdown)
+
+    @staticmethod
+    def flush():
+        """Block until all output logged before this call has been written"""
+        if Console._writer_thread is not None:
+            Console._enqueue(None, None, None, True)
+
+    @staticmethod
+    def _shutdown():
+        thread = Console._writer_thread
+        if thread is None:
+            return
+        with Console._cond:
+            Console._running = False
+            Console._cond.notify()
+        thread.join()
+        Console._writer_thread = None
+
+    @staticmethod
+    def _format(timestamp: datetime.datetime | None, colour, string: str) -> str:
+        if timestamp is None:
+            return f"{string}\n"
+        ts = timestamp.strftime("%H:%M:%S.%f")[:-3]
+        return f"[{ts}]{colour} {string}{colorama.Fore.RESET}\n"
+
+    @staticmethod
+    def _emit(out: str):
+        with _lock:
+            try:
+                sys.stdout.write(out)
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                # Terminal has gone away
+                pass
+
+    @staticmethod
+    def _writer():
+        cond = Console._cond
+        while True:
+            with cond:
+                while Console._running and not Console._pending:
+                    cond.wait()
+                if not Console._pending:
+                    # Stopped with nothing left to write
+                    return
+                items = list(Console._pending)
+                Console._pending.clear()
+                dropped = Console._dropped
+                Console._dropped = 0
+            # Write everything that is pending in a single call
+            out = []
+            for ts, colour, string, done in items:
+                if string is not None:
+                    out.append(Console._format(ts, colour, string))
+                elif done is None and dropped:
+                    # Marker for where lines started being dropped
+                    msg = f"{dropped} log lines dropped"
+                    out.append(Console._format(ts, colorama.Fore.RED, msg))
+                    dropped = 0
+            Console._emit("".join(out))
+            for _, _, _, done in items:
+                if done is not None:
+                    done.set()
+
+    @staticmethod
+    def _enqueue(timestamp: datetime.datetime | None, colour, string: str | None, wait: bool):
+        if Console._writer_thread is None:
+            if string is not None:
+                Console._emit(Console._format(timestamp, colour, string))
+            return
+        done = threading.Event() if wait else None
+        with Console._cond:
+            if done is None and len(Console._pending) >= Console.QUEUE_DEPTH:
+                # Terminal can't keep up, drop rather than stall the caller
+                if Console._dropped == 0:
+                    Console._pending.append((timestamp, None, None, None))
+                Console._dropped += 1
+                return
+            Console._pending.append((timestamp, colour, string, done))
+            Console._cond.notify()
+        if done is not None:
+            done.wait()
 
     @staticmethod
     def log_error(message):
@@ -40,7 +144,7 @@ class Console:
     @staticmethod
     def log_tx(data_type, length, prefix=""):
         """Log transmitted packet to terminal"""
-        Console.log(
+        Console._defer(
             datetime.datetime.now(),
             colorama.Fore.BLUE,
             f"{prefix}TX {data_type.name} {length} bytes",
@@ -49,18 +153,25 @@ class Console:
     @staticmethod
     def log_rx(data_type, length, prefix=""):
         """Log received packet to terminal"""
-        Console.log(
+        Console._defer(
             datetime.datetime.now(),
             colorama.Fore.GREEN,
             f"{prefix}RX {data_type.name} {length} bytes",
         )
 
+    @staticmethod
+    def write(string: str):
+        """Write unformatted text to terminal, ordered with other console output"""
+        Console._enqueue(None, None, string, False)
+
     @staticmethod
     def log(timestamp: datetime.datetime, colour, string: str):
-        """Log colourised string to terminal"""
-        ts = timestamp.strftime("%H:%M:%S.%f")[:-3]
-        with _lock:
-            print(f"[{ts}]{colour} {string}{colorama.Fore.RESET}")
+        """Log colourised string to terminal, returning once it has been written"""
+        Console._enqueue(timestamp, colour, string, True)
+
+    @staticmethod
+    def _defer(timestamp: datetime.datetime | None, colour, string: str):
+        Console._enqueue(timestamp, colour, string, False)
 
 
 def choose_one(title: str, options: list[str]) -> tuple[int, str]:
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 
+import functools
+
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 
+@functools.lru_cache(maxsize=64)
 def hkdf_derive(input_key: bytes, salt: bytes, info: bytes) -> bytes:
     """Derive a cryptographic key using HKDF-SHA256"""
+    # Device keys rotate daily, so every packet for a device derives the same key
     hkdf = HKDF(
         algorithm=hashes.SHA256(),
         length=32,
@@ -16,13 +20,17 @@ def hkdf_derive(input_key: bytes, salt: bytes, info: bytes) -> bytes:
     return hkdf.derive(input_key)
 
 
+@functools.lru_cache(maxsize=64)
+def _chachapoly_cipher(key: bytes) -> ChaCha20Poly1305:
+    # Only a handful of keys are in use at any time, avoid re-initialising the cipher per packet
+    return ChaCha20Poly1305(key)
+
+
 def chachapoly_encrypt(key: bytes, associated_data: bytes | None, nonce: bytes, payload: bytes) -> bytes:
     """Encrypt a payload using ChaCha20-Poly1305"""
-    cipher = ChaCha20Poly1305(key)
-    return cipher.encrypt(nonce, payload, associated_data)
+    return _chachapoly_cipher(key).encrypt(nonce, payload, associated_data)
 
 
 def chachapoly_decrypt(key: bytes, associated_data: bytes | None, nonce: bytes, payload: bytes) -> bytes:
     """Decrypt a payload using ChaCha20-Poly1305"""
-    cipher = ChaCha20Poly1305(key)
-    return cipher.decrypt(nonce, payload, associated_data)
+    return _chachapoly_cipher(key).decrypt(nonce, payload, associated_data)
@@ -2,14 +2,14 @@
 
 """Simple local RPC server implementation"""
 
-import ctypes
 import random
+import struct
+import threading
 import typing
 from collections.abc import Callable
 
 import infuse_iot.definitions.rpc as defs
 import infuse_iot.epacket.interface as interface
-from infuse_iot import rpc
 from infuse_iot.common import InfuseType
 from infuse_iot.database import DeviceDatabase
 from infuse_iot.epacket.packet import (
@@ -22,21 +22,36 @@ from infuse_iot.util.console import Console
 
 RpcCallback = Callable[[PacketReceived, int, bytes, typing.Any], None]
 
+# rpc.RequestHeader: request ID, command ID
+_REQ_HDR = struct.Struct("<IH")
+# rpc.ResponseHeader: request ID, command ID, return code
+_RSP_HDR = struct.Struct("<IHh")
+
 
 class LocalRpcServer:
     """Basic class supporting locally generated commands"""
 
     def __init__(self, database: DeviceDatabase, native_bt: bool = False):
         self._cnt = random.randint(0, 2**31)
+        # Commands are generated from both the transmit and receive threads
+        self._lock = threading.Lock()
         self._ddb = database
         self._native_bt = native_bt
         self._queued: dict[int, tuple[RpcCallback | None, typing.Any]] = {}
 
+    def _queue(self, cb: RpcCallback | None, cb_ctx: typing.Any) -> int:
+        """Allocate a request ID and register the response callback"""
+        with self._lock:
+            request_id = self._cnt
+            self._cnt = (self._cnt + 1) & 0xFFFFFFFF
+        self._queued[request_id] = (cb, cb_ctx)
+        return request_id
+
     def generate_serial(
         self, command: int, args: bytes, auth: Auth, cb: RpcCallback | None, cb_ctx: typing.Any
     ) -> PacketOutputRouted:
         """Generate RPC packet from arguments"""
-        cmd_bytes = bytes(rpc.RequestHeader(self._cnt, command)) + args
+        cmd_bytes = _REQ_HDR.pack(self._queue(cb, cb_ctx), command) + args
         cmd_pkt = PacketOutputRouted(
             [HopOutput.serial(auth)],
             InfuseType.RPC_CMD,
@@ -44,35 +59,29 @@ class LocalRpcServer:
         )
         assert self._ddb.gateway is not None
         cmd_pkt.route[0].infuse_id = self._ddb.gateway
-        self._queued[self._cnt] = (cb, cb_ctx)
-        self._cnt += 1
         return cmd_pkt
 
     def generate_remote_bt_direct(
         self, remote: int, command: int, args: bytes, auth: Auth, cb: RpcCallback | None, cb_ctx: typing.Any
     ) -> PacketOutputRouted:
         """Generate RPC packet for Bluetooth remote from arguments, without intermediate hops"""
-        cmd_bytes = bytes(rpc.RequestHeader(self._cnt, command)) + args
+        cmd_bytes = _REQ_HDR.pack(self._queue(cb, cb_ctx), command) + args
         cmd_pkt = PacketOutputRouted(
             [HopOutput(remote, interface.ID.BT_CENTRAL, auth)],
             InfuseType.RPC_CMD,
             cmd_bytes,
         )
-        self._queued[self._cnt] = (cb, cb_ctx)
-        self._cnt += 1
         return cmd_pkt
 
     def generate_remote_bt(
         self, remote: int, command: int, args: bytes, auth: Auth, cb: RpcCallback | None, cb_ctx: typing.Any
     ) -> PacketOutputRouted:
         """Generate RPC packet for Bluetooth remote from arguments"""
-        cmd_bytes = bytes(rpc.RequestHeader(self._cnt, command)) + args
+        cmd_bytes = _REQ_HDR.pack(self._queue(cb, cb_ctx), command) + args
 
         assert self._ddb.gateway is not None
         serial = HopOutput(self._ddb.gateway, interface.ID.SERIAL, Auth.DEVICE)
         bt = HopOutput(remote, interface.ID.BT_CENTRAL, auth)
-        self._queued[self._cnt] = (cb, cb_ctx)
-        self._cnt += 1
         return PacketOutputRouted(
             [serial, bt],
             InfuseType.RPC_CMD,
@@ -96,21 +105,22 @@ class LocalRpcServer:
             return
 
         # Inspect the response header
-        header = rpc.ResponseHeader.from_buffer_copy(pkt.payload)
+        request_id, command_id, return_code = _RSP_HDR.unpack_from(pkt.payload)
 
         # Was this a BT connect response with key information?
-        if header.command_id == defs.bt_connect_infuse.COMMAND_ID:
-            resp = defs.bt_connect_infuse.response.from_buffer_copy(pkt.payload[ctypes.sizeof(header) :])
+        if command_id == defs.bt_connect_infuse.COMMAND_ID:
+            resp = defs.bt_connect_infuse.response.from_buffer_copy(pkt.payload, _RSP_HDR.size)
             if_addr = interface.Address.BluetoothLeAddr.from_rpc_struct(resp.peer)
             infuse_id = self._ddb.infuse_id_from_bluetooth(if_addr)
             if infuse_id is None:
                 Console.log_error(f"Infuse ID of {if_addr} not known")
 
         # Determine if the response is to a command we initiated
-        if header.request_id not in self._queued:
+        queued = self._queued.pop(request_id, None)
+        if queued is None:
             return
 
         # Run the callback
-        (cb, cb_ctx) = self._queued.pop(header.request_id)
+        (cb, cb_ctx) = queued
         if cb is not None:
-            cb(pkt, header.return_code, pkt.payload[ctypes.sizeof(header) :], cb_ctx)
+            cb(pkt, return_code, pkt.payload[_RSP_HDR.size :], cb_ctx)
@@ -1,8 +1,45 @@
 #!/usr/bin/env python3
 
+import socket
 import threading
 from collections.abc import Callable
 
+from infuse_iot.util.console import Console
+
+
+class SelectableEvent(threading.Event):
+    """Event that can also be waited on with `select`, alongside sockets"""
+
+    def __init__(self):
+        super().__init__()
+        self._rx, self._tx = socket.socketpair()
+        self._rx.setblocking(False)
+        self._tx.setblocking(False)
+
+    def set(self):
+        super().set()
+        try:
+            self._tx.send(b"\x00")
+        except BlockingIOError:
+            # Already pending wakeups, nothing more to do
+            pass
+
+    def clear(self):
+        super().clear()
+        try:
+            while self._rx.recv(64):
+                pass
+        except BlockingIOError:
+            pass
+
+    def fileno(self) -> int:
+        """Descriptor that is readable while the event is set"""
+        return self._rx.fileno()
+
+    def close(self):
+        self._rx.close()
+        self._tx.close()
+
 
 class SignaledThread(threading.Thread):
     """Thread that can be signaled to terminate"""
@@ -18,13 +55,16 @@ class SignaledThread(threading.Thread):
 
     def run_loop(self):
         """Run the thread function in a loop"""
+        fn = self._fn
+        is_set = self._sig.is_set
         try:
-            while not self._sig.is_set():
-                self._fn()
+            while not is_set():
+                fn()
         except Exception as e:
             import traceback
 
-            # Print the exception traceback
+            # Print the exception traceback after any pending console output
+            Console.flush()
             traceback.print_exception(e)
             # Set the termination signal
             self._sig.set()
@@ -1,5 +1,7 @@
+import ctypes
 import os
 
+from infuse_iot.definitions.tdf import readings
 from infuse_iot.tdf import TDF, unknown_tdf_factory
 
 # assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
@@ -78,3 +80,30 @@ def test_unknown_tdf():
         assert unknown_id == unknown_inst.ID
         assert str(unknown_id) == unknown_inst.NAME
         assert unknown_len == len(unknown_inst.data)
+
+    # Classes are reused for repeated unknown TDFs
+    assert unknown_tdf_factory(401, 6) is unknown_tdf_factory(401, 6)
+    assert unknown_tdf_factory(401, 6) is not unknown_tdf_factory(401, 7)
+
+
+def test_vla_tdf():
+    vla_class = readings.algorithm_output
+    base_len = ctypes.sizeof(vla_class)
+
+    first = vla_class.from_buffer_consume(base_len * b"\x00" + b"\x01\x02\x03")
+    second = vla_class.from_buffer_consume(base_len * b"\x00" + b"\x04\x05\x06")
+    longer = vla_class.from_buffer_consume(base_len * b"\x00" + b"\x07\x08\x09\x0a")
+
+    assert list(first.output) == [1, 2, 3]
+    assert list(second.output) == [4, 5, 6]
+    assert list(longer.output) == [7, 8, 9, 10]
+    # Constructed VLA types are reused for the same length
+    assert type(first) is type(second)
+    assert type(first) is not type(longer)
+    assert first.ID == vla_class.ID
+
+
+def test_extended_relative_time():
+    for offset in [0, 1, -1, 12345, -12345, 2**23 - 1, -(2**23)]:
+        t = TDF.ExtendedRelativeTime.from_buffer_copy(offset.to_bytes(3, "little", signed=True))
+        assert t.offset == offset
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import os
+
+from infuse_iot.common import InfuseType
+from infuse_iot.epacket.packet import Auth, PacketOutput
+from infuse_iot.socket_comms import GatewayRequestEpacketSend
+from infuse_iot.tools.gateway import SerialTxThread
+
+assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
+
+_GATEWAY_ID = 0x1234
+
+
+class FakeDatabase:
+    gateway = _GATEWAY_ID
+
+    def has_shared_key(self, _infuse_id: int) -> bool:
+        return False
+
+
+class FakeCommon:
+    """Gateway state where security_state responses are never received"""
+
+    def __init__(self):
+        self.server = None
+        self.ddb = FakeDatabase()
+        self.queries: list[int] = []
+
+    def query_device_key(self, infuse_id: int, _cb_event=None) -> None:
+        self.queries.append(infuse_id)
+
+
+def test_gateway_key_query_lost(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("infuse_iot.tools.gateway.time.time", lambda: now)
+
+    common = FakeCommon()
+    tx = SerialTxThread(common)  # type: ignore[arg-type]
+
+    def send():
+        tx._handle_epacket_send(
+            GatewayRequestEpacketSend(PacketOutput(_GATEWAY_ID, Auth.DEVICE, InfuseType.RPC_CMD, b"\x00"))
+        )
+
+    # Single query for packets waiting on the same key
+    send()
+    now += SerialTxThread.KEY_QUERY_TIMEOUT / 2
+    send()
+    assert common.queries == [_GATEWAY_ID]
+    assert len(tx._awaiting_key) == 2
+
+    # Response is lost, all packets behind the query are dropped once it expires
+    now += SerialTxThread.KEY_QUERY_TIMEOUT / 2
+    tx._service_awaiting_key()
+    assert tx._awaiting_key == []
+
+    # Next packet sends a new query instead of waiting behind the expired one
+    send()
+    assert common.queries == [_GATEWAY_ID, _GATEWAY_ID]
+    assert len(tx._awaiting_key) == 1
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import ctypes
+import os
+import struct
+from collections import deque
+
+import infuse_iot.definitions.rpc as defs
+from infuse_iot.common import InfuseType
+from infuse_iot.epacket.packet import Auth, PacketReceived
+from infuse_iot.rpc import SECURITY_STATE_RSP
+from infuse_iot.rpc_client import RpcClient
+from infuse_iot.socket_comms import (
+    ClientNotification,
+    ClientNotificationEpacketReceived,
+    GatewayRequestEpacketSend,
+)
+
+assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
+
+_REQ = struct.Struct("<IHIB")
+_DATA_HDR = struct.Struct("<II")
+_RSP_HDR = struct.Struct("<IHh")
+
+
+class FakeDevice:
+    """Fake gateway interface that acknowledges RPC data like a device would"""
+
+    def __init__(self, drop_acks: bool = False):
+        self.drop_acks = drop_acks
+        self.rx_queue: deque[ClientNotification] = deque()
+        self.received = bytearray()
+        self.data_pkts = 0
+        self.max_unread_acks = 0
+        self._request_id = 0
+        self._command_id = 0
+        self._size = 0
+        self.ack_period = 0
+
+    def _notify(self, ptype: InfuseType, payload: bytes):
+        self.rx_queue.append(ClientNotificationEpacketReceived(PacketReceived([], ptype, payload)))
+
+    def _unread_acks(self) -> int:
+        return sum(1 for n in self.rx_queue if n.epacket.ptype == InfuseType.RPC_DATA_ACK)  # type: ignore
+
+    def send(self, req: GatewayRequestEpacketSend):
+        pkt = req.epacket
+        if pkt.ptype == InfuseType.RPC_CMD:
+            self._request_id, self._command_id, self._size, self.ack_period = _REQ.unpack_from(pkt.payload)
+            # Initial ACK to start the data transfer
+            self._notify(InfuseType.RPC_DATA_ACK, struct.pack("<I", self._request_id))
+            return
+        assert pkt.ptype == InfuseType.RPC_DATA
+        request_id, offset = _DATA_HDR.unpack_from(pkt.payload)
+        assert request_id == self._request_id
+        assert offset == len(self.received)
+        # ACKs not yet read by the client are the ACK periods still in flight
+        self.max_unread_acks = max(self.max_unread_acks, self._unread_acks() + 1)
+        self.received += pkt.payload[_DATA_HDR.size :]
+        self.data_pkts += 1
+        if self.data_pkts % self.ack_period == 0 and not self.drop_acks:
+            self._notify(InfuseType.RPC_DATA_ACK, struct.pack("<I", self._request_id))
+        if len(self.received) == self._size:
+            self._notify(InfuseType.RPC_RSP, _RSP_HDR.pack(self._request_id, self._command_id, 0))
+
+    def receive(self) -> ClientNotification | None:
+        if self.rx_queue:
+            return self.rx_queue.popleft()
+        return None
+
+
+def _data_send(device: FakeDevice, ack_window: int, data: bytes):
+    client = RpcClient(device, 68, 0x1234, ack_window=ack_window)  # type: ignore
+    client.set_timeout(0.1)
+    return client.run_data_send_cmd(1, Auth.DEVICE, b"", data, None, lambda b: None)  # type: ignore
+
+
+def test_rpc_client_ack_window():
+    data = os.urandom(64 * 100)
+
+    for window in [1, 2, 4]:
+        device = FakeDevice()
+        hdr, _ = _data_send(device, window, data)
+        assert hdr is not None
+        assert hdr.return_code == 0
+        assert device.received == data
+        # Never more than the window of ACK periods unacknowledged
+        assert device.max_unread_acks == window
+
+
+def test_rpc_client_ack_window_missing_ack():
+    data = os.urandom(64 * 100)
+
+    for window in [1, 3]:
+        device = FakeDevice(drop_acks=True)
+        hdr, rsp = _data_send(device, window, data)
+        # Transfer stops once the window is full and no ACK arrives
+        assert hdr is None
+        assert rsp is None
+        assert device.data_pkts == window * device.ack_period
+
+
+def test_security_state_rsp_layout():
+    # Struct unpacking matches the generated response definition
+    rsp = defs.security_state.response
+    assert SECURITY_STATE_RSP.size == ctypes.sizeof(rsp)
+    raw = os.urandom(SECURITY_STATE_RSP.size)
+    decoded = rsp.from_buffer_copy(raw)
+    cloud_key, device_key, network_id, challenge_response_type = SECURITY_STATE_RSP.unpack(raw)
+    assert cloud_key == bytes(decoded.cloud_public_key)
+    assert device_key == bytes(decoded.device_public_key)
+    assert network_id == decoded.network_id
+    assert challenge_response_type == decoded.challenge_response_type
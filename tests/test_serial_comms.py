@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import sys
+import time
+
+import pytest
+import serial
+
+from infuse_iot.serial_comms import SerialFrame, SerialPort
+
+assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
+
+
+def _frame(payload: bytes) -> bytes:
+    return SerialFrame.SYNC + len(payload).to_bytes(2, "little") + payload
+
+
+def test_reconstructor_bulk():
+    reconstructor = SerialFrame.Reconstructor()
+
+    payload_a = bytes(range(20))
+    payload_b = b"\xd5\xca" * 10
+    stream = b"hello\n" + _frame(payload_a) + b"world\n" + _frame(payload_b) + b"end"
+
+    frames, text = reconstructor.feed(stream)
+    assert frames == [payload_a, payload_b]
+    assert text == b"hello\nworld\nend"
+
+
+def test_reconstructor_split():
+    payloads = [random.randbytes(random.randint(1, 300)) for _ in range(50)]
+    stream = b"".join(b"log line\n" + _frame(p) for p in payloads)
+
+    # Feeding the stream in arbitrary chunks must produce the same output
+    for chunk_size in [1, 2, 3, 7, 64, 1024]:
+        reconstructor = SerialFrame.Reconstructor()
+        frames = []
+        text = bytearray()
+        for offset in range(0, len(stream), chunk_size):
+            f, t = reconstructor.feed(stream[offset : offset + chunk_size])
+            frames += f
+            text += t
+        assert frames == payloads
+        assert text == b"log line\n" * len(payloads)
+
+
+def test_reconstructor_partial_sync():
+    reconstructor = SerialFrame.Reconstructor()
+
+    # Trailing first sync byte is held until the next chunk
+    frames, text = reconstructor.feed(b"abc\xd5")
+    assert frames == []
+    assert text == b"abc"
+    # Not followed by the second sync byte, released as text
+    frames, text = reconstructor.feed(b"def")
+    assert frames == []
+    assert text == b"\xd5def"
+
+
+def test_reconstructor_text_only():
+    reconstructor = SerialFrame.Reconstructor()
+
+    for _ in range(3):
+        frames, text = reconstructor.feed(b"plain console output\n")
+        assert frames == []
+        assert text == b"plain console output\n"
+    # Frames are still detected after text-only chunks
+    frames, text = reconstructor.feed(_frame(b"abc"))
+    assert frames == [b"abc"]
+    assert text == b""
+
+
+def test_serial_port_no_fileno():
+    # Ports without a usable file descriptor (Windows, URL handlers) read through pyserial
+    port = SerialPort("loop://")
+    port._ser = serial.serial_for_url("loop://", do_not_open=True, timeout=0.05)
+    port.open()
+    assert port._fd is None
+    assert port.read_bytes(1024) == b""
+    port.write(b"hello")
+    assert port.read_bytes(1024) == _frame(b"hello")
+    port.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="pty not available")
+def test_serial_port_fileno():
+    import pty
+
+    controller, peripheral = pty.openpty()
+    port = SerialPort(os.ttyname(peripheral))
+    port.open()
+    assert port._fd is not None
+    assert port.read_bytes(1024) == b""
+    os.write(controller, b"hello")
+    time.sleep(0.01)
+    assert port.read_bytes(1024) == b"hello"
+    port.close()
+    os.close(controller)
+    os.close(peripheral)
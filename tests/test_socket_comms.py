@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
+import errno
 import os
+import select
 
 import infuse_iot.socket_comms as comms
+from infuse_iot.common import InfuseType
+from infuse_iot.epacket.interface import ID as Interface
+from infuse_iot.epacket.interface import Address
+from infuse_iot.epacket.packet import Auth, HopReceived, PacketOutput, PacketReceived
 
 assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
 
@@ -37,3 +43,218 @@ def test_socket_comms():
     # Client receives the response
     recv_rsp = client.receive()
     assert isinstance(recv_rsp, comms.ClientNotificationCommsCheck)
+
+
+def test_socket_comms_broadcast_many():
+    multicast_addr = comms.default_multicast_address()
+    test_addr = (multicast_addr[0], multicast_addr[1] + 1)
+
+    server = comms.LocalServer(test_addr)
+    client = comms.LocalClient(test_addr)
+
+    # Multiple notifications in a single datagram are returned individually, in order
+    notifications = [
+        comms.ClientNotificationConnectionCreated(0x1234, 100),
+        comms.ClientNotificationCommsCheck(),
+        comms.ClientNotificationConnectionDropped(0x5678),
+    ]
+    server.broadcast_many(notifications)
+
+    rsp = client.receive()
+    assert isinstance(rsp, comms.ClientNotificationConnectionCreated)
+    assert rsp.infuse_id == 0x1234
+    assert rsp.max_payload == 100
+    assert isinstance(client.receive(), comms.ClientNotificationCommsCheck)
+    rsp = client.receive()
+    assert isinstance(rsp, comms.ClientNotificationConnectionDropped)
+    assert rsp.infuse_id == 0x5678
+    assert client.receive() is None
+
+    client.close()
+    server.close()
+
+
+def test_socket_comms_broadcast_many_split():
+    multicast_addr = comms.default_multicast_address()
+    test_addr = (multicast_addr[0], multicast_addr[1] + 1)
+
+    server = comms.LocalServer(test_addr)
+    client = comms.LocalClient(test_addr)
+
+    # Notifications larger than a single batch are split across multiple datagrams
+    hop = HopReceived(
+        0x1234,
+        Interface.SERIAL,
+        Address(Address.SerialAddr()),
+        Auth.DEVICE,
+        0x123456,
+        1,
+        20,
+        -60,
+    )
+    payloads = [bytes([i]) * 1000 for i in range(20)]
+    server.broadcast_many(
+        [comms.ClientNotificationEpacketReceived(PacketReceived([hop], InfuseType.SERIAL_LOG, p)) for p in payloads]
+    )
+
+    # Inspect the raw datagrams
+    sizes = []
+    while select.select([client._input_sock], [], [], 0.2)[0]:
+        sizes.append(len(client._input_sock.recv(comms.MAX_DGRAM)))
+    assert len(sizes) > 1
+    assert all(size <= comms.MAX_TX_BATCH for size in sizes)
+    client.close()
+
+    # Platforms with a smaller datagram limit fall back to individual datagrams
+    class LimitedSocket:
+        def __init__(self):
+            self.sent: list[bytes] = []
+
+        def sendto(self, data, _addr):
+            if len(data) > 1500:
+                raise OSError(errno.EMSGSIZE, "Message too long")
+            self.sent.append(bytes(data))
+
+    limited = LimitedSocket()
+    output_sock = server._output_sock
+    server._output_sock = limited  # type: ignore
+    notifications = [comms.ClientNotificationConnectionDropped(i) for i in range(200)]
+    server.broadcast_many(notifications)
+    assert limited.sent == [n.to_wire() for n in notifications]
+
+    server._output_sock = output_sock
+    server.close()
+
+
+def test_socket_comms_epacket():
+    multicast_addr = comms.default_multicast_address()
+    test_addr = (multicast_addr[0], multicast_addr[1] + 1)
+
+    server = comms.LocalServer(test_addr)
+    client = comms.LocalClient(test_addr)
+
+    # Binary payloads are transported unmodified in both directions
+    payload = bytes(range(256))
+    hop = HopReceived(
+        0x1234,
+        Interface.BT_ADV,
+        Address(Address.BluetoothLeAddr(0, 0x112233445566)),
+        Auth.DEVICE,
+        0x123456,
+        1000,
+        20,
+        -60,
+    )
+    serial_hop = HopReceived(
+        0x9876,
+        Interface.SERIAL,
+        Address(Address.SerialAddr()),
+        Auth.NETWORK,
+        0x654321,
+        1001,
+        21,
+        0,
+    )
+    server.broadcast(
+        comms.ClientNotificationEpacketReceived(PacketReceived([hop, serial_hop], InfuseType.TDF, payload))
+    )
+    rsp = client.receive()
+    assert isinstance(rsp, comms.ClientNotificationEpacketReceived)
+    assert rsp.epacket.ptype == InfuseType.TDF
+    assert rsp.epacket.payload == payload
+    assert len(rsp.epacket.route) == 2
+    assert rsp.epacket.route[0].infuse_id == 0x1234
+    assert rsp.epacket.route[0].interface == Interface.BT_ADV
+    assert rsp.epacket.route[0].interface_address.val == hop.interface_address.val
+    assert rsp.epacket.route[0].auth == Auth.DEVICE
+    assert rsp.epacket.route[0].rssi == -60
+    assert rsp.epacket.route[0].key_identifier == 0x123456
+    assert rsp.epacket.route[0].gps_time == 1000
+    assert rsp.epacket.route[0].sequence == 20
+    assert rsp.epacket.route[1].infuse_id == 0x9876
+    assert rsp.epacket.route[1].interface == Interface.SERIAL
+    assert isinstance(rsp.epacket.route[1].interface_address.val, Address.SerialAddr)
+    assert rsp.epacket.route[1].auth == Auth.NETWORK
+
+    client.send(comms.GatewayRequestEpacketSend(PacketOutput(0x5678, Auth.NETWORK, InfuseType.RPC_CMD, payload)))
+    req = server.receive()
+    assert isinstance(req, comms.GatewayRequestEpacketSend)
+    assert req.epacket.infuse_id == 0x5678
+    assert req.epacket.auth == Auth.NETWORK
+    assert req.epacket.ptype == InfuseType.RPC_CMD
+    assert req.epacket.payload == payload
+
+    client.close()
+    server.close()
+
+
+def test_socket_comms_receive_raw():
+    multicast_addr = comms.default_multicast_address()
+    test_addr = (multicast_addr[0], multicast_addr[1] + 1)
+
+    server = comms.LocalServer(test_addr)
+    client = comms.LocalClient(test_addr)
+
+    payload = b"log line\n"
+    hop = HopReceived(
+        0x1234,
+        Interface.BT_CENTRAL,
+        Address(Address.BluetoothLeAddr(0, 0x112233445566)),
+        Auth.DEVICE,
+        0x123456,
+        1000,
+        20,
+        -60,
+    )
+    server.broadcast_many(
+        [
+            comms.ClientNotificationEpacketReceived(PacketReceived([hop], InfuseType.SERIAL_LOG, payload)),
+            comms.ClientNotificationEpacketReceived(PacketReceived([], InfuseType.SERIAL_LOG, payload)),
+            comms.ClientNotificationConnectionDropped(0x1234),
+        ]
+    )
+
+    raw = client.receive_raw()
+    assert raw is not None
+    assert raw.type == comms.ClientNotification.Type.EPACKET_RECV
+    assert raw.ptype == InfuseType.SERIAL_LOG
+    assert raw.source_id == 0x1234
+    assert raw.source_interface == Interface.BT_CENTRAL
+    assert raw.payload == payload
+    # Packet without a route has no source
+    raw = client.receive_raw()
+    assert raw is not None
+    assert raw.type == comms.ClientNotification.Type.EPACKET_RECV
+    assert raw.ptype == InfuseType.SERIAL_LOG
+    assert raw.source_id is None
+    assert raw.source_interface is None
+    assert raw.payload == payload
+    raw = client.receive_raw()
+    assert raw is not None
+    assert raw.type == comms.ClientNotification.Type.CONNECTION_DROPPED
+    assert raw.ptype is None
+    assert client.receive_raw() is None
+
+    client.close()
+    server.close()
+
+
+def test_socket_comms_receive_nonblocking():
+    multicast_addr = comms.default_multicast_address()
+    test_addr = (multicast_addr[0], multicast_addr[1] + 1)
+
+    server = comms.LocalServer(test_addr)
+    client = comms.LocalClient(test_addr)
+
+    # Nothing queued, returns immediately
+    assert server.receive(block=False) is None
+
+    # Queued requests are still returned
+    client.send(comms.GatewayRequestCommsCheck())
+    client.send(comms.GatewayRequestObservedDevices())
+    assert isinstance(server.receive(), comms.GatewayRequestCommsCheck)
+    assert isinstance(server.receive(block=False), comms.GatewayRequestObservedDevices)
+    assert server.receive(block=False) is None
+
+    client.close()
+    server.close()
@@ -10,6 +10,7 @@ from infuse_iot.util.argparse import (
     BtLeAddress,
     HexString,
     InfuseDeviceId,
+    PositiveInt,
     ServerPort,
     ValidDir,
     ValidFile,
@@ -81,6 +82,18 @@ def test_hexstring():
     assert HexString("aa00bb") == b"\xaa\x00\xbb"
     assert HexString("00AABB") == b"\x00\xaa\xbb"
 
+
+def test_positive_int():
+    with pytest.raises(argparse.ArgumentTypeError):
+        PositiveInt("NotInt")
+    with pytest.raises(argparse.ArgumentTypeError):
+        PositiveInt("0")
+    with pytest.raises(argparse.ArgumentTypeError):
+        PositiveInt("-1")
+    assert PositiveInt("1") == 1
+    assert PositiveInt("16") == 16
+
+
 def test_server_port():
     with pytest.raises(argparse.ArgumentTypeError):
         ServerPort("NotAnInt")
@@ -98,6 +111,7 @@ def test_server_port():
     assert ServerPort("8751") == ("224.1.1.1", 8751)
     assert ServerPort("65535") == ("224.1.1.1", 65535)
 
+
 def test_server_port_parser(capsys):
     parser = argparse.ArgumentParser()
     add_server_port_parser(parser)
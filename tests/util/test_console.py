@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import colorama
+
+from infuse_iot.common import InfuseType
+from infuse_iot.util.console import Console
+
+assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
+
+_SCRIPT = """
+import sys
+from infuse_iot.common import InfuseType
+from infuse_iot.util.console import Console
+from infuse_iot.util.threading import SignaledThread
+
+
+def failing_thread():
+    raise RuntimeError("thread failure")
+
+
+def run():
+    Console.init()
+    for i in range(5000):
+        Console.log_rx(InfuseType.TDF, i)
+        if i % 1000 == 0:
+            Console.log_info(f"info {i}")
+    Console.write("last line")
+    thread = SignaledThread(failing_thread)
+    thread.start()
+    thread.join()
+    sys.exit("exit message")
+
+
+# Mirrors `infuse_iot.app.main.main`
+try:
+    run()
+finally:
+    Console.flush()
+"""
+
+
+def test_console_order_and_exit_flush():
+    # Deferred output is written in order with synchronous output, and flushed before exiting
+    proc = subprocess.run(
+        [sys.executable, "-c", _SCRIPT],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        check=False,
+    )
+    assert proc.returncode == 1
+    lines = proc.stdout.decode().splitlines()
+
+    expected = []
+    for i in range(5000):
+        expected.append(f"RX TDF {i} bytes")
+        if i % 1000 == 0:
+            expected.append(f"info {i}")
+    expected.append("last line")
+
+    # Strip timestamps
+    logged = [line.split("] ", 1)[-1] for line in lines[: len(expected)]]
+    assert logged == expected
+    # Thread traceback and exit message follow all console output
+    assert lines[len(expected)] == "Traceback (most recent call last):"
+    assert lines[-2] == "RuntimeError: thread failure"
+    assert lines[-1] == "exit message"
+
+
+class _SlowTerminal:
+    """stdout replacement that blocks writes until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.output: list[str] = []
+
+    def write(self, data: str):
+        self.release.wait()
+        self.output.append(data)
+
+    def flush(self):
+        pass
+
+
+def test_console_slow_terminal(monkeypatch):
+    Console.init()
+    terminal = _SlowTerminal()
+    monkeypatch.setattr(sys, "stdout", terminal)
+    try:
+        # High rate logging never blocks on a stalled terminal, excess lines are dropped
+        start = time.time()
+        for i in range(4 * Console.QUEUE_DEPTH):
+            Console.log_rx(InfuseType.TDF, i)
+        assert time.time() - start < 1.0
+        # Queue is bounded, plus the marker recording where lines were dropped
+        assert len(Console._pending) <= Console.QUEUE_DEPTH + 1
+
+        # Synchronous logs complete once the terminal drains, after all earlier output
+        threading.Timer(0.1, terminal.release.set).start()
+        Console.log_error("after")
+        lines = "".join(terminal.output).splitlines()
+        assert any("log lines dropped" in line for line in lines)
+        assert lines[-1].endswith(f"after{colorama.Fore.RESET}")
+    finally:
+        terminal.release.set()
+        Console._shutdown()
+        colorama.deinit()
+
+
+def test_console_sync_log_under_traffic(monkeypatch):
+    Console.init()
+    stop = threading.Event()
+
+    def traffic():
+        while not stop.is_set():
+            Console.log_rx(InfuseType.TDF, 10)
+
+    monkeypatch.setattr(sys, "stdout", io.StringIO())
+    thread = threading.Thread(target=traffic)
+    thread.start()
+    try:
+        # Synchronous logs only wait for their own line, not for the deferred traffic to stop
+        start = time.time()
+        for i in range(10):
+            Console.log_info(f"info {i}")
+            Console.flush()
+        assert time.time() - start < 2.0
+    finally:
+        stop.set()
+        thread.join()
+        Console._shutdown()
+        colorama.deinit()
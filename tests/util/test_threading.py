@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
 import os
+import select
+import threading
 import time
 
-from infuse_iot.util.threading import SignaledThread
+from infuse_iot.util.threading import SelectableEvent, SignaledThread
 
 assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
 
@@ -28,3 +30,25 @@ def test_signaled_thread():
     assert not t.is_alive()
     # Exact number of iterations can be fuzy in CI
     assert 9 <= count <= 11
+
+
+def test_selectable_event():
+    e = SelectableEvent()
+    # Not readable until set
+    assert select.select([e], [], [], 0) == ([], [], [])
+    assert not e.is_set()
+
+    # Setting from another thread wakes the select
+    threading.Timer(0.1, e.set).start()
+    start = time.time()
+    assert select.select([e], [], [], 2.0)[0] == [e]
+    assert time.time() - start < 1.0
+    assert e.is_set()
+    assert e.wait(0)
+
+    # Multiple sets are cleared together
+    e.set()
+    e.clear()
+    assert not e.is_set()
+    assert select.select([e], [], [], 0) == ([], [], [])
+    e.close()
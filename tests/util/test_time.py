@@ -2,6 +2,7 @@
 
 import os
 
+from infuse_iot.time import InfuseTime
 from infuse_iot.util.time import humanised_seconds
 
 assert "TOXTEMPDIR" in os.environ, "you must run these tests using tox"
@@ -18,3 +19,19 @@ def test_humanised_seconds():
             assert isinstance(result, str)
             print(f"{seconds:10}: {result}")
             seconds *= 10
+
+
+def test_infuse_epoch_time():
+    # Known conversion, GPS epoch with no subseconds
+    assert InfuseTime.unix_time_from_epoch(0) == InfuseTime.GPS_UNIX_OFFSET - InfuseTime.UNIX_LEAP_SECONDS
+    assert InfuseTime.unix_time_from_epoch(65536 + 32768) == InfuseTime.unix_time_from_epoch(0) + 1.5
+    # Conversion round trips
+    for unix_time in [1700000000.0, 1700000000.5, 1700000000.25, 1800000123.75]:
+        assert InfuseTime.unix_time_from_epoch(InfuseTime.epoch_time_from_unix(unix_time)) == unix_time
+
+
+def test_utc_time_string_log():
+    assert InfuseTime.utc_time_string_log(1700000000.0) == "2023-11-14T22:13:20.000000"
+    assert InfuseTime.utc_time_string_log(1700000000.123456) == "2023-11-14T22:13:20.123456"
+    # Rounding up to the next second
+    assert InfuseTime.utc_time_string_log(1700000000.9999996) == "2023-11-14T22:13:21.000000"